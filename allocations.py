@@ -0,0 +1,221 @@
+import gc
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+from profiler import profiler
+
+# Раз в столько кадров снимаем tracemalloc-снимки на границах фаз для разбивки по строкам
+SAMPLE_EVERY = 60
+# Первые кадры каждого экрана за все время не считаем: кэши и пулы еще заполняются.
+# Счет накопительный, иначе короткие экраны (прокрутка длится меньше) не измерялись бы вовсе
+WARMUP_FRAMES = 120
+
+
+class PhaseStats:
+    __slots__ = ("frames", "blocks", "bytes", "peak", "grew", "gc")
+
+    def __init__(self):
+        self.frames = 0
+        self.blocks = 0
+        self.bytes = 0
+        self.peak = 0
+        self.grew = 0
+        self.gc = 0
+
+
+class Phase:
+    # Фаза кадра для with: время пишется в профилировщик, выделения - в трекер под тем же именем
+    __slots__ = ("tracker", "name", "profile", "started")
+
+    def __init__(self, tracker: "AllocationTracker", name: str, profile: bool = True):
+        self.tracker = tracker
+        self.name = name
+        self.profile = profile
+        self.started = 0.0
+
+    def __enter__(self):
+        self.tracker.begin(self.name)
+        if self.profile:
+            self.started = profiler.start()
+
+    def __exit__(self, *exc_info):
+        if self.profile:
+            profiler.stop(self.name, self.started)
+        self.tracker.end()
+
+
+class AllocationTracker:
+    # Выделения памяти по фазам кадра: чистый прирост блоков и байт, пик временных байт,
+    # на выборочных кадрах - прирост по строкам исходников; плюс сборки мусора и их паузы
+    def __init__(self):
+        self.enabled = False
+        self.frames = 0
+        self.state = ""
+        self.state_frames: Dict[str, int] = {}
+        self.warm = False
+        self.phase: Optional[str] = None
+        self.sampling = False
+        self.overhead_blocks = 0
+        self.overhead_bytes = 0
+        self.phases: Dict[str, PhaseStats] = {}
+        self.scopes: Dict[str, Phase] = {}
+        self.lines: Dict[tuple, List[int]] = {}
+        self.samples: Dict[str, int] = {}
+        self.gc_started = 0.0
+        self.gc_stats = [[0, 0.0, 0.0, 0] for _ in range(3)]
+        self._blocks = 0
+        self._traced = 0
+        self._snapshot = None
+        self._busy = False
+
+    def start(self, frames: int = 1):
+        if self.enabled:
+            return
+        tracemalloc.start(frames)
+        gc.callbacks.append(self.on_gc)
+        self.enabled = True
+        # Сам замер тоже создает пару объектов (и with освобождает метод __enter__): меряем пустую фазу и вычитаем
+        self.warm = True
+        calibrate = Phase(self, "calibrate", profile=False)
+        for _ in range(5):
+            with calibrate:
+                pass
+        stats = self.phases.pop(self.key("calibrate"))
+        self.overhead_blocks = round(stats.blocks / stats.frames)
+        self.overhead_bytes = round(stats.bytes / stats.frames)
+        self.warm = False
+
+    def stop(self):
+        if not self.enabled:
+            return
+        gc.callbacks.remove(self.on_gc)
+        tracemalloc.stop()
+        self.enabled = False
+
+    def frame(self, state: str):
+        if not self.enabled:
+            return
+        self.frames += 1
+        self.state = state
+        frames = self.state_frames.get(state, 0) + 1
+        self.state_frames[state] = frames
+        self.warm = frames > WARMUP_FRAMES
+        self.sampling = self.frames % SAMPLE_EVERY == 0
+        if self.sampling and self.warm:
+            self.samples[state] = self.samples.get(state, 0) + 1
+
+    def scope(self, name: str) -> Phase:
+        # Объекты фаз создаются один раз, чтобы сам with ничего не выделял
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = Phase(self, name)
+        return scope
+
+    def key(self, phase: str) -> str:
+        return f"{self.state}:{phase}"
+
+    def begin(self, phase: str):
+        if not self.enabled:
+            return
+        self.phase = phase
+        if self.sampling:
+            # Снимок сам создает тысячи объектов и вызывает сборки, их в статистику не пишем
+            self._busy = True
+            self._snapshot = self.take_snapshot()
+            self._busy = False
+            return
+        self._blocks = sys.getallocatedblocks()
+        self._traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def end(self):
+        if not self.enabled or self.phase is None:
+            return
+        if self.sampling:
+            self._busy = True
+            self.record_lines(self.take_snapshot())
+            self._busy = False
+            self.phase = None
+            return
+        blocks = sys.getallocatedblocks() - self._blocks
+        current, peak = tracemalloc.get_traced_memory()
+        phase = self.phase
+        self.phase = None
+        if not self.warm:
+            return
+        stats = self.phases.get(self.key(phase))
+        if stats is None:
+            stats = self.phases[self.key(phase)] = PhaseStats()
+        blocks -= self.overhead_blocks
+        stats.frames += 1
+        stats.blocks += blocks
+        stats.bytes += current - self._traced - self.overhead_bytes
+        stats.peak += peak - self._traced
+        stats.grew += blocks > 0
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<unknown>"),
+        ])
+
+    def record_lines(self, snapshot: tracemalloc.Snapshot):
+        # Рост по строкам между снимками в начале и конце фазы; временные объекты, освобожденные
+        # внутри фазы, сюда не попадают - их видно только по пику фазы
+        # Объекты из списков свободных (float, tuple) числятся за строкой, где блок выделили впервые
+        if not self.warm:
+            return
+        for diff in snapshot.compare_to(self._snapshot, "lineno"):
+            if diff.count_diff or diff.size_diff:
+                frame = diff.traceback[0]
+                line = self.lines.setdefault((self.state, self.phase, frame.filename, frame.lineno), [0, 0])
+                line[0] += diff.count_diff
+                line[1] += diff.size_diff
+        self._snapshot = None
+
+    def on_gc(self, phase: str, info: Dict):
+        if self._busy:
+            return
+        if phase == "start":
+            self.gc_started = time.perf_counter()
+            return
+        pause = time.perf_counter() - self.gc_started
+        stats = self.gc_stats[info["generation"]]
+        stats[0] += 1
+        stats[1] += pause
+        stats[2] = max(stats[2], pause)
+        stats[3] += info["collected"]
+        if self.phase is not None and not self.sampling and self.warm:
+            phase_stats = self.phases.get(self.key(self.phase))
+            if phase_stats is not None:
+                phase_stats.gc += 1
+
+    def report(self, top: int = 15) -> List[str]:
+        lines = [f"выделения памяти: {self.frames} кадров, первые {WARMUP_FRAMES} кадров каждого экрана за запуск "
+                 f"не учитываются, накладные расходы замера ({self.overhead_blocks} блоков) вычтены",
+                 f"{'фаза':<28} {'кадров':>7} {'блоков/кадр':>12} {'байт/кадр':>10} {'пик байт/кадр':>14} "
+                 f"{'кадров с ростом':>16} {'сборок':>7}"]
+        ranked = sorted(self.phases.items(), key=lambda item: item[1].peak / item[1].frames, reverse=True)
+        for key, stats in ranked:
+            frames = stats.frames
+            lines.append(f"{key:<28} {frames:>7} {stats.blocks / frames:>12.2f} {stats.bytes / frames:>10.0f} "
+                         f"{stats.peak / frames:>14.0f} {stats.grew / frames * 100:>15.0f}% {stats.gc:>7}")
+        if self.lines:
+            lines.append(f"строки с наибольшим приростом блоков (выборочные кадры, раз в {SAMPLE_EVERY}):")
+            # Нормируем на число выборочных кадров своего экрана
+            ranked_lines = sorted(((count / self.samples[state], size / self.samples[state], f"{state}:{phase}", filename, lineno)
+                                   for (state, phase, filename, lineno), (count, size) in self.lines.items()), reverse=True)
+            for count, size, key, filename, lineno in ranked_lines[:top]:
+                if count <= 0:
+                    break
+                lines.append(f"  {key:<28} {filename}:{lineno}  {count:+.2f} блоков/кадр, {size:+.0f} байт/кадр")
+        for generation, (count, total, worst, collected) in enumerate(self.gc_stats):
+            if count:
+                lines.append(f"сборка мусора, поколение {generation}: {count} раз, собрано {collected} объектов, "
+                             f"пауза {total * 1000:.2f} мс всего, макс {worst * 1000:.3f} мс")
+        return lines
+
+
+allocations = AllocationTracker()
@@ -0,0 +1,264 @@
+import pygame
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional
+from constants import *
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+AssetKey = Tuple
+AtlasKey = Tuple[str, Tuple[int, int], bool, bool, Tuple[int, ...]]
+
+OPAQUE_ALPHAS = (255,)
+# Мигание персонажа после удара
+BLINK_ALPHAS = (128, 255)
+# Растворение гриба: шаг 15 за кадр
+FADE_ALPHAS = tuple(range(0, 256, 15))
+
+
+class SpriteAtlas:
+    def __init__(self, base: pygame.Surface, flip: bool = False, pressed: bool = False, alphas: Tuple[int, ...] = OPAQUE_ALPHAS):
+        self.base = base
+        self.alphas = tuple(sorted(alphas))
+        self.variants: Dict[Tuple[bool, bool, int], pygame.Surface] = {}
+        for flipped in ((False, True) if flip else (False,)):
+            oriented = pygame.transform.flip(base, True, False) if flipped else base
+            for is_pressed in ((False, True) if pressed else (False,)):
+                img = oriented
+                if is_pressed:
+                    img = oriented.copy()
+                    img.fill((255, 255, 255, 128), None, pygame.BLEND_RGBA_MULT)
+                for alpha in self.alphas:
+                    variant = img
+                    if alpha != 255:
+                        variant = img.copy()
+                        variant.set_alpha(alpha)
+                    self.variants[(flipped, is_pressed, alpha)] = variant
+        # Для любого alpha 0..255 заранее находим ближайший уровень
+        self._nearest = [min(self.alphas, key=lambda level: abs(level - a)) for a in range(256)]
+
+    def get(self, flipped: bool = False, pressed: bool = False, alpha: int = 255) -> pygame.Surface:
+        return self.variants[(flipped, pressed, self._nearest[alpha])]
+
+    def get_bytes(self) -> int:
+        return sum(surf.get_pitch() * surf.get_height() for surf in self.variants.values() if surf is not self.base)
+
+
+def decode_file(path: str, size: Tuple[int, int]) -> Optional[pygame.Surface]:
+    if not path:
+        return None
+    try:
+        return pygame.transform.scale(pygame.image.load(path), size)
+    except (pygame.error, FileNotFoundError):
+        return None
+
+
+class AssetManager:
+    def __init__(self, budget_bytes: int = 64 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Поверхности и атласы в одном LRU-списке с общим бюджетом
+        self._surfaces: "OrderedDict[AssetKey, object]" = OrderedDict()
+        self._sizes: Dict[AssetKey, int] = {}
+        self._listings: Dict[str, List[str]] = {}
+        self._exists: Dict[str, bool] = {}
+
+    def image(self, path: str, size: Tuple[int, int], alpha: bool = True) -> pygame.Surface:
+        key = (path, (int(size[0]), int(size[1])), alpha)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surf
+        self.misses += 1
+        return self.put(path, key[1], alpha, decode_file(path, key[1]))
+
+    def put(self, path: str, size: Tuple[int, int], alpha: bool, raw: Optional[pygame.Surface]) -> pygame.Surface:
+        # convert() требует окна, поэтому вызывается только в главном потоке
+        key = (path, (int(size[0]), int(size[1])), alpha)
+        try:
+            if raw is None:
+                raise pygame.error("нет изображения")
+            surf = raw.convert_alpha() if alpha else raw.convert()
+        except pygame.error:
+            surf = pygame.Surface(key[1], pygame.SRCALPHA)
+            surf.fill(RED)
+        self._store(key, surf, surf.get_pitch() * surf.get_height())
+        return surf
+
+    def has_image(self, path: str, size: Tuple[int, int], alpha: bool = True) -> bool:
+        return (path, (int(size[0]), int(size[1])), alpha) in self._surfaces
+
+    def has_atlas(self, path: str, size: Tuple[int, int], flip: bool = False, pressed: bool = False,
+                  alphas: Tuple[int, ...] = OPAQUE_ALPHAS) -> bool:
+        return ("atlas", path, (int(size[0]), int(size[1])), flip, pressed, tuple(alphas)) in self._surfaces
+
+    def atlas(self, path: str, size: Tuple[int, int], flip: bool = False, pressed: bool = False,
+              alphas: Tuple[int, ...] = OPAQUE_ALPHAS) -> SpriteAtlas:
+        key = ("atlas", path, (int(size[0]), int(size[1])), flip, pressed, tuple(alphas))
+        atlas = self._surfaces.get(key)
+        if atlas is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return atlas
+        self.misses += 1
+        atlas = SpriteAtlas(self.image(path, size), flip, pressed, alphas)
+        self._store(key, atlas, atlas.get_bytes())
+        return atlas
+
+    def _store(self, key: AssetKey, entry, nbytes: int):
+        self._surfaces[key] = entry
+        self._sizes[key] = nbytes
+        self.bytes_used += nbytes
+        # Вытесняем самые давно использованные, но не только что добавленную
+        while self.bytes_used > self.budget_bytes and len(self._surfaces) > 1:
+            old_key, _ = self._surfaces.popitem(last=False)
+            self.bytes_used -= self._sizes.pop(old_key)
+            self.evictions += 1
+
+    def listdir(self, directory: str, prefix: str = "", extensions: Tuple[str, ...] = IMAGE_EXTENSIONS) -> List[str]:
+        files = self._listings.get(directory)
+        if files is None:
+            try:
+                files = sorted(os.listdir(directory))
+            except OSError:
+                # Папки ресурсов создаются при первом обращении, чтобы было куда положить файлы
+                files = []
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                except OSError:
+                    pass
+            self._listings[directory] = files
+        return [f for f in files if f.startswith(prefix) and f.endswith(extensions)]
+
+    def exists(self, path: str) -> bool:
+        found = self._exists.get(path)
+        if found is None:
+            found = os.path.exists(path)
+            self._exists[path] = found
+        return found
+
+    def asset_path(self, directory: str, name: str) -> str:
+        path = os.path.join(directory, name)
+        return path if self.exists(path) else ""
+
+    def invalidate_listings(self):
+        self._listings.clear()
+        self._exists.clear()
+
+    def clear(self):
+        self._surfaces.clear()
+        self._sizes.clear()
+        self.bytes_used = 0
+        self.invalidate_listings()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._surfaces),
+            "bytes": self.bytes_used,
+            "budget": self.budget_bytes,
+        }
+
+
+assets = AssetManager()
+
+
+class AssetLoader:
+    def __init__(self, manager: AssetManager, atlases: List[AtlasKey], workers: int = 4):
+        self.manager = manager
+        # Каждому атласу нужно базовое изображение с альфа-каналом
+        jobs = list(dict.fromkeys((key[0], key[1], True) for key in atlases))
+        jobs = [job for job in jobs if not manager.has_image(*job)]
+        self.atlases = [key for key in dict.fromkeys(atlases) if not manager.has_atlas(*key)]
+        self.sizes = {job: self._file_size(job[0]) for job in jobs}
+        self.total_items = len(jobs) + len(self.atlases)
+        self.total_bytes = sum(self.sizes.values())
+        self.done_items = 0
+        self.done_bytes = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asset-loader")
+        self._pending = [(job, self._executor.submit(decode_file, job[0], job[1])) for job in jobs]
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path) if path else 0
+        except OSError:
+            return 0
+
+    def poll(self, max_atlases: int = 4):
+        still_pending = []
+        for job, future in self._pending:
+            if future.done():
+                self.manager.put(job[0], job[1], job[2], future.result())
+                self.done_items += 1
+                self.done_bytes += self.sizes[job]
+            else:
+                still_pending.append((job, future))
+        self._pending = still_pending
+        # Атласы собираются в главном потоке, по несколько за кадр
+        while not self._pending and self.atlases and max_atlases > 0:
+            self.manager.atlas(*self.atlases.pop())
+            self.done_items += 1
+            max_atlases -= 1
+        if self.done:
+            self._executor.shutdown(wait=False)
+
+    def wait(self):
+        for _, future in self._pending:
+            future.result()
+        self.poll(max_atlases=len(self.atlases))
+
+    @property
+    def done(self) -> bool:
+        return not self._pending and not self.atlases
+
+    @property
+    def progress(self) -> float:
+        if self.total_items == 0:
+            return 100
+        # Байты декодирования дают точнее, атласы учитываем поштучно
+        items = self.done_items / self.total_items
+        if self.total_bytes:
+            return 100 * (0.8 * self.done_bytes / self.total_bytes + 0.2 * items)
+        return 100 * items
+
+
+TextKey = Tuple[pygame.font.Font, str, Tuple[int, ...], bool]
+
+
+class TextCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._surfaces: "OrderedDict[TextKey, pygame.Surface]" = OrderedDict()
+
+    def render(self, font: pygame.font.Font, text: str, color: Tuple[int, ...] = WHITE, antialias: bool = True) -> pygame.Surface:
+        key = (font, text, tuple(color), antialias)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self._surfaces[key] = surf
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._surfaces)}
+
+
+texts = TextCache()
@@ -0,0 +1,149 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+import pygame
+from constants import *
+from assets import assets
+
+TILE_WIDTH = 200
+# Исходная картинка растягивается на эту ширину, дальше фон повторяется по кругу
+PERIOD_WIDTH = 2400
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def tile_executor() -> ThreadPoolExecutor:
+    # Один поток на все фоны: плитки мелкие, а исходник читают без гонок
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background-tiles")
+    return _executor
+
+
+class TiledBackground:
+    def __init__(self, path: str, color: Tuple[int, int, int], ground_color: Tuple[int, int, int],
+                 tile_width: int = TILE_WIDTH, period: int = PERIOD_WIDTH, ahead: int = 2, behind: int = 1):
+        self.path = path
+        self.color = color
+        self.ground_color = ground_color
+        self.tile_width = tile_width
+        self.tile_count = max(1, period // tile_width)
+        self.period = self.tile_count * tile_width
+        self.ahead = ahead
+        self.behind = behind
+        self.tiles: Dict[int, pygame.Surface] = {}
+        self._pending: Dict[int, Future] = {}
+        self._source: Optional[pygame.Surface] = None
+        self._source_loaded = False
+        self._source_lock = threading.Lock()
+        self.decoded = 0
+        self.evicted = 0
+        self.stalls = 0
+
+    def _load_source(self) -> Optional[pygame.Surface]:
+        with self._source_lock:
+            if not self._source_loaded:
+                try:
+                    self._source = pygame.image.load(self.path) if self.path else None
+                except (pygame.error, FileNotFoundError):
+                    self._source = None
+                self._source_loaded = True
+            return self._source
+
+    def _decode_tile(self, key: int) -> Optional[pygame.Surface]:
+        # Выполняется в фоновом потоке: режем исходник и масштабируем только нужный кусок
+        source = self._load_source()
+        if source is None:
+            return None
+        source_width, source_height = source.get_size()
+        x0 = min(source_width - 1, key * self.tile_width * source_width // self.period)
+        x1 = max(x0 + 1, (key + 1) * self.tile_width * source_width // self.period)
+        part = source.subsurface((x0, 0, x1 - x0, source_height))
+        return pygame.transform.scale(part, (self.tile_width, SCREEN_HEIGHT))
+
+    def _finish(self, raw: Optional[pygame.Surface]) -> pygame.Surface:
+        self.decoded += 1
+        if raw is not None:
+            return raw.convert()
+        tile = pygame.Surface((self.tile_width, SCREEN_HEIGHT)).convert()
+        tile.fill(self.color)
+        pygame.draw.rect(tile, self.ground_color, (0, GROUND_HEIGHT, self.tile_width, SCREEN_HEIGHT - GROUND_HEIGHT))
+        return tile
+
+    def visible_range(self, offset: int) -> Tuple[int, int]:
+        return offset // self.tile_width, (offset + SCREEN_WIDTH - 1) // self.tile_width
+
+    def request(self, first: int, last: int):
+        for i in range(first, last + 1):
+            key = i % self.tile_count
+            if key not in self.tiles and key not in self._pending:
+                self._pending[key] = tile_executor().submit(self._decode_tile, key)
+
+    def poll(self):
+        for key, future in list(self._pending.items()):
+            if future.done():
+                del self._pending[key]
+                self.tiles[key] = self._finish(future.result())
+
+    def tile(self, key: int) -> pygame.Surface:
+        tile = self.tiles.get(key)
+        if tile is None:
+            # Плитку не успели подготовить заранее - ждем ее в кадре
+            self.stalls += 1
+            future = self._pending.pop(key, None)
+            raw = future.result() if future is not None else self._decode_tile(key)
+            tile = self._finish(raw)
+            self.tiles[key] = tile
+        return tile
+
+    def evict(self, first: int, last: int):
+        keep = {i % self.tile_count for i in range(first, last + 1)}
+        for key in [key for key in self.tiles if key not in keep]:
+            del self.tiles[key]
+            self.evicted += 1
+
+    def prefetch(self, offset: int):
+        first, last = self.visible_range(offset)
+        self.request(first, last + self.ahead)
+
+    def ready(self, offset: int) -> bool:
+        self.poll()
+        first, last = self.visible_range(offset)
+        return all(i % self.tile_count in self.tiles for i in range(first, last + 1))
+
+    def draw(self, surface: pygame.Surface, offset: int):
+        self.poll()
+        first, last = self.visible_range(offset)
+        for i in range(first, last + 1):
+            surface.blit(self.tile(i % self.tile_count), (i * self.tile_width - offset, 0))
+        self.request(last + 1, last + self.ahead)
+        self.evict(first - self.behind, last + self.ahead)
+
+    def clear(self):
+        self.tiles.clear()
+        self._pending.clear()
+        with self._source_lock:
+            self._source = None
+            self._source_loaded = False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tiles": len(self.tiles),
+            "pending": len(self._pending),
+            "decoded": self.decoded,
+            "evicted": self.evicted,
+            "stalls": self.stalls,
+            "bytes": sum(tile.get_pitch() * tile.get_height() for tile in self.tiles.values()),
+        }
+
+
+def background_path(bg_type: str) -> str:
+    bg_images = assets.listdir(BACKGROUNDS_DIR, bg_type)
+    return os.path.join(BACKGROUNDS_DIR, bg_images[0]) if bg_images else ""
+
+
+def load_background(bg_type: str) -> TiledBackground:
+    color = PURPLE if bg_type == "loading" else (BLUE if bg_type == "leaderboard" else GREEN)
+    ground_color = BLACK if bg_type == "forest" else (100, 100, 100)
+    return TiledBackground(background_path(bg_type), color, ground_color)
@@ -0,0 +1,287 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import time
+from typing import Dict, Iterator, List, Tuple
+from constants import *
+from game_objects import WEAPONS
+from mushroom_engine import VectorSimulation, np
+from simulation import Simulation, TickInput
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+WEAPON_FIELDS = ["damage", "range", "cooldown"]
+DEFAULT_PARAMS = {
+    "speed": 2,
+    "small_health": 2,
+    "big_health": 4,
+    "brain_chance": 0.3,
+    "group_min": 3,
+    "group_max": 6,
+}
+for _weapon in WEAPONS:
+    for _field in WEAPON_FIELDS:
+        DEFAULT_PARAMS[f"{_weapon['image']}_{_field}"] = _weapon[_field]
+
+WEAPON_NAMES = [weapon["image"] for weapon in WEAPONS]
+# Столбцами, если есть чем: parquet через pyarrow, иначе npz через numpy; CSV - последний вариант
+if pyarrow is not None:
+    DEFAULT_OUT = "batch_results.parquet"
+elif np is not None:
+    DEFAULT_OUT = "batch_results.npz"
+else:
+    DEFAULT_OUT = "batch_results.csv"
+OUTCOMES = ["death", "victory", "timeout"]
+
+
+class TunedSimulation(Simulation):
+    def __init__(self, seed: int, params: Dict):
+        super().__init__(seed)
+        self.params = params
+        self.min_group_size = params["group_min"]
+        self.max_group_size = params["group_max"]
+        self.damage_dealt = 0
+        self.death_tick = -1
+
+    def start(self, char_type: str):
+        super().start(char_type)
+        for weapon in self.character.weapons:
+            for field in WEAPON_FIELDS:
+                weapon[field] = self.params[f"{weapon['image']}_{field}"]
+
+    def spawn_mushroom_group(self):
+        first = len(self.mushrooms)
+        super().spawn_mushroom_group()
+        params = self.params
+        for i in range(first, len(self.mushrooms)):
+            mushroom = self.mushrooms[i]
+            mushroom.speed = params["speed"]
+            if mushroom.is_big:
+                mushroom.health = params["big_health"]
+                mushroom.brain_chance = params["brain_chance"]
+            else:
+                mushroom.health = params["small_health"]
+
+    def resolve_attack(self):
+        # Урон считаем по падению здоровья грибов в зоне удара
+        before = sum(mushroom.health for mushroom in self.mushrooms if mushroom.health > 0)
+        super().resolve_attack()
+        after = sum(mushroom.health for mushroom in self.mushrooms if mushroom.health > 0)
+        self.damage_dealt += before - after
+
+    def on_game_over(self):
+        if self.character.health <= 0:
+            self.death_tick = self.ticks
+
+
+class TunedVectorSimulation(TunedSimulation, VectorSimulation):
+    # Параметры грибов задаются стаду целиком: его грибы - виды только для чтения
+    def __init__(self, seed: int, params: Dict):
+        super().__init__(seed, params)
+        herd = self.herd
+        herd.speed = params["speed"]
+        herd.small_health = params["small_health"]
+        herd.big_health = params["big_health"]
+        herd.brain_chance = params["brain_chance"]
+
+    def spawn_mushroom_group(self):
+        VectorSimulation.spawn_mushroom_group(self)
+
+
+ENGINES = {"scalar": TunedSimulation, "vector": TunedVectorSimulation}
+
+
+class Bot:
+    # Подходит к ближайшему живому грибу на дальность оружия, разворачивается к нему и бьет
+    def __init__(self, weapon: int):
+        self.weapon = weapon
+
+    def __call__(self, sim: Simulation) -> TickInput:
+        character = sim.character
+        target = None
+        best = None
+        for mushroom in sim.mushrooms:
+            if mushroom.health > 0:
+                distance = abs(mushroom.x - character.x)
+                if best is None or distance < best:
+                    target, best = mushroom, distance
+        if target is None:
+            return TickInput(weapon=self.weapon)
+        reach = character.weapons[self.weapon]["range"]
+        side = 1 if target.x >= character.x else -1
+        toward = (side < 0, side > 0)
+        if best > reach + 20:
+            return TickInput(*toward, weapon=self.weapon)
+        if best < reach - 25 and 0 < character.x < SCREEN_WIDTH:
+            return TickInput(side > 0, side < 0, weapon=self.weapon)
+        if character.direction != side:
+            return TickInput(*toward, weapon=self.weapon)
+        return TickInput(attack=character.attack_cooldown == 0, weapon=self.weapon)
+
+
+def play(params: Dict, seed: int, max_ticks: int, engine: str = "scalar") -> Tuple:
+    weapon = seed % len(WEAPONS)
+    sim = ENGINES[engine](seed, params)
+    sim.start("elf")
+    bot = Bot(weapon)
+    while sim.game_state in ["playing", "moving_forward"] and sim.ticks < max_ticks:
+        sim.step(bot(sim))
+    if sim.death_tick >= 0:
+        outcome = "death"
+    elif sim.game_state == "game_over":
+        outcome = "victory"
+    else:
+        outcome = "timeout"
+    damage_taken = sim.character.max_health - sim.character.health
+    return sim.score, sim.current_group - 1, outcome, sim.ticks, sim.death_tick, weapon, damage_taken, sim.damage_dealt
+
+
+def play_chunk(task: Tuple[int, Dict, List[int], int, str]) -> Tuple[int, List[Tuple]]:
+    combo, params, seeds, max_ticks, engine = task
+    return combo, [play(params, seed, max_ticks, engine) for seed in seeds]
+
+
+def parse_grid(specs: List[str]) -> List[Dict]:
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in DEFAULT_PARAMS:
+            raise SystemExit(f"Неизвестный параметр {name}, доступны: {', '.join(DEFAULT_PARAMS)}")
+        kind = type(DEFAULT_PARAMS[name])
+        axes.append([(name, kind(value)) for value in values.split(",")])
+    return [dict(DEFAULT_PARAMS, **dict(combo)) for combo in itertools.product(*axes)]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    i = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+def aggregate(params: Dict, games: List[Tuple]) -> Dict:
+    row = dict(params)
+    scores = sorted(game[0] for game in games)
+    row["games"] = len(games)
+    row["score_mean"] = sum(scores) / len(scores)
+    for q in (10, 25, 50, 75, 90):
+        row[f"score_p{q}"] = percentile(scores, q)
+    row["score_max"] = scores[-1]
+    row["groups_mean"] = sum(game[1] for game in games) / len(games)
+    for outcome in OUTCOMES:
+        row[f"{outcome}_rate"] = sum(game[2] == outcome for game in games) / len(games)
+    deaths = sorted(game[4] for game in games if game[4] >= 0)
+    row["death_tick_mean"] = sum(deaths) / len(deaths) if deaths else -1
+    row["death_tick_p50"] = percentile(deaths, 50) if deaths else -1
+    row["ticks_mean"] = sum(game[3] for game in games) / len(games)
+    for i, name in enumerate(WEAPON_NAMES):
+        used = [game for game in games if game[5] == i]
+        row[f"{name}_games"] = len(used)
+        row[f"{name}_score_mean"] = sum(game[0] for game in used) / len(used) if used else 0.0
+        row[f"{name}_taken_mean"] = sum(game[6] for game in used) / len(used) if used else 0.0
+        row[f"{name}_dealt_mean"] = sum(game[7] for game in used) / len(used) if used else 0.0
+    return row
+
+
+class ResultWriter:
+    # Формат по расширению: .parquet (pyarrow) и .npz (numpy, массив на столбец) - по столбцам, .csv - по строкам.
+    # Строки пишутся по мере готовности комбинаций
+    def __init__(self, path: str):
+        self.path = path
+        self.format = os.path.splitext(path)[1].lower()
+        if self.format == ".parquet" and pyarrow is None:
+            raise SystemExit("Для вывода в parquet нужен pyarrow")
+        if self.format == ".npz" and np is None:
+            raise SystemExit("Для вывода в npz нужен numpy")
+        if self.format not in (".parquet", ".npz", ".csv"):
+            raise SystemExit(f"Неизвестный формат {path}: нужен .parquet, .npz или .csv")
+        self._file = None
+        self._writer = None
+        self._columns: Dict[str, List] = {}
+
+    def write(self, row: Dict):
+        if self.format == ".parquet":
+            table = pyarrow.Table.from_pylist([row])
+            if self._writer is None:
+                self._writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+            return
+        if self.format == ".npz":
+            for name, value in row.items():
+                self._columns.setdefault(name, []).append(value)
+            # npz не дописывается: файл переписывается целиком, комбинаций немного
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                np.savez(f, **{name: np.asarray(values) for name, values in self._columns.items()})
+            os.replace(temp_path, self.path)
+            return
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=list(row))
+            self._writer.writeheader()
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        if self._writer is not None:
+            if self.format == ".parquet":
+                self._writer.close()
+            else:
+                self._file.close()
+
+
+def make_tasks(combos: List[Dict], games: int, seed: int, chunk: int, max_ticks: int,
+               engine: str) -> Iterator[Tuple]:
+    seeds = list(range(seed, seed + games))
+    for combo, params in enumerate(combos):
+        for i in range(0, games, chunk):
+            yield combo, params, seeds[i:i + chunk], max_ticks, engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный прогон игр ботом для подбора баланса")
+    parser.add_argument("--games", type=int, default=1000, help="игр на каждую комбинацию параметров")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                        help="ось перебора, можно указать несколько раз")
+    parser.add_argument("--seed", type=int, default=0, help="первое зерно; комбинации играют на одних и тех же зернах")
+    parser.add_argument("--max-ticks", type=int, default=TICK_RATE * 60 * 5,
+                        help="предел длины игры в тактах симуляции (по умолчанию 5 минут)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=50, help="игр в одной задаче процесса")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="scalar",
+                        help="грибы объектами или массивами numpy")
+    parser.add_argument("--out", default=DEFAULT_OUT,
+                        help="формат по расширению: .parquet (pyarrow) или .npz (numpy) - по столбцам, "
+                             f".csv - по строкам; по умолчанию {DEFAULT_OUT}")
+    args = parser.parse_args()
+
+    combos = parse_grid(args.grid)
+    remaining = [args.games] * len(combos)
+    results: Dict[int, List[Tuple]] = {}
+    writer = ResultWriter(args.out)
+    started = time.perf_counter()
+    played = 0
+    with multiprocessing.Pool(args.workers) as pool:
+        tasks = make_tasks(combos, args.games, args.seed, args.chunk, args.max_ticks, args.engine)
+        for combo, games in pool.imap_unordered(play_chunk, tasks):
+            results.setdefault(combo, []).extend(games)
+            remaining[combo] -= len(games)
+            played += len(games)
+            if remaining[combo] == 0:
+                row = aggregate(combos[combo], results.pop(combo))
+                writer.write(row)
+                changed = ", ".join(f"{name}={combos[combo][name]}" for name in combos[combo]
+                                    if combos[combo][name] != DEFAULT_PARAMS[name]) or "по умолчанию"
+                print(f"{changed}: счет {row['score_mean']:.1f} (p50 {row['score_p50']}), "
+                      f"групп {row['groups_mean']:.2f}, смертей {row['death_rate'] * 100:.0f}%")
+    writer.close()
+    elapsed = time.perf_counter() - started
+    print(f"{played} игр за {elapsed:.1f} с, {played / elapsed:.0f} игр/с на {args.workers} процессах -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+import pygame
+from constants import *
+from game import Game
+from mushroom_engine import VectorSimulation
+
+PHASES = ["update", "mushrooms", "draw", "present", "frame"]
+
+
+class VectorGame(Game, VectorSimulation):
+    # Та же игра с грибами в массивах numpy; sim.mushrooms - виды только для чтения
+    pass
+
+
+ENGINES = {"scalar": Game, "vector": VectorGame}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    values = sorted(samples)
+    return {
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def setup_idle_hud(game: Game):
+    game.clear_mushrooms()
+    game.group_defeated = False
+
+
+def setup_group(size: int) -> Callable[[Game], None]:
+    def setup(game: Game):
+        game.clear_mushrooms()
+        game.min_group_size = game.max_group_size = size
+        game.spawn_mushroom_group()
+    return setup
+
+
+def tick_attack(game: Game, frame: int):
+    if frame % 15 == 0:
+        game.pending_attack = True
+
+
+def tick_brains(game: Game, frame: int):
+    if frame % 5 == 0:
+        game.add_brain(game.character.x + game.rng.randint(-300, 300), GROUND_HEIGHT - BRAIN_HEIGHT)
+
+
+def setup_scroll(game: Game):
+    game.clear_mushrooms()
+    game.max_background_offset = 0
+    game.game_state = "moving_forward"
+
+
+def tick_scroll(game: Game, frame: int):
+    # Держим игру в состоянии прокрутки, уровень бесконечный - плитки фона подгружаются на ходу
+    if game.game_state != "moving_forward":
+        game.clear_mushrooms()
+        game.game_state = "moving_forward"
+
+
+SCENARIOS = {
+    "idle_hud": (setup_idle_hud, None),
+    "group_6": (setup_group(6), tick_attack),
+    "horde_300": (setup_group(300), tick_attack),
+    "brain_drops": (setup_group(6), tick_brains),
+    "scroll": (setup_scroll, tick_scroll),
+}
+
+
+def make_game(seed: int, dirty_rects: bool, engine: str = "scalar") -> Game:
+    game = ENGINES[engine](dirty_rects=dirty_rects)
+    # Game.start берет зерно забега из общего генератора: фиксируем его, чтобы прогоны совпадали
+    random.seed(seed)
+    game.update_loading()
+    game.loader.wait()
+    game.update_loading()
+    game.player_name = "bench"
+    game.start("elf")
+    game.character.health = 10 ** 9
+    return game
+
+
+def measure(name: str, frames: int, seed: int, dirty_rects: bool, trace: bool, engine: str = "scalar") -> Dict:
+    setup, tick = SCENARIOS[name]
+    game = make_game(seed, dirty_rects, engine)
+    setup(game)
+    samples = {phase: [] for phase in PHASES}
+    mushroom_time = [0.0]
+    update_mushrooms = game.update_mushrooms
+
+    def timed_update_mushrooms():
+        t = time.perf_counter()
+        update_mushrooms()
+        mushroom_time[0] += time.perf_counter() - t
+    game.update_mushrooms = timed_update_mushrooms
+
+    blocks = []
+    peaks = []
+    if trace:
+        tracemalloc.start()
+    for frame in range(frames):
+        if tick:
+            tick(game, frame)
+        pygame.event.pump()
+        mushroom_time[0] = 0.0
+        blocks_before = sys.getallocatedblocks()
+        if trace:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        game.update_game()
+        t1 = time.perf_counter()
+        game.draw_game()
+        t2 = time.perf_counter()
+        game.present()
+        t3 = time.perf_counter()
+        if trace:
+            peaks.append(tracemalloc.get_traced_memory()[1] - traced_before)
+        blocks.append(sys.getallocatedblocks() - blocks_before)
+        samples["update"].append((t1 - t0) * 1000)
+        samples["mushrooms"].append(mushroom_time[0] * 1000)
+        samples["draw"].append((t2 - t1) * 1000)
+        samples["present"].append((t3 - t2) * 1000)
+        samples["frame"].append((t3 - t0) * 1000)
+    if trace:
+        tracemalloc.stop()
+    game.leaderboard_store.close()
+    return {
+        "samples": samples,
+        "blocks": blocks,
+        "peaks": peaks,
+        "entities": {"mushrooms": len(game.mushrooms), "brains": len(game.brains),
+                     "submitted": game.render_counts[0], "culled": game.render_counts[1]},
+        "pools": game.pool_stats(),
+    }
+
+
+def run_scenario(name: str, frames: int, seed: int, dirty_rects: bool, trace: bool, engine: str = "scalar") -> Dict:
+    # Время меряем без tracemalloc, выделения памяти - отдельным проходом
+    timing = measure(name, frames, seed, dirty_rects, False, engine)
+    result = {phase: summarize(values) for phase, values in timing["samples"].items()}
+    blocks = timing["blocks"]
+    result["alloc"] = {"net_blocks_per_frame": sum(blocks) / len(blocks), "peak_transient_bytes_p95": None}
+    if trace:
+        traced = measure(name, frames, seed, dirty_rects, True, engine)
+        result["alloc"]["peak_transient_bytes_p95"] = percentile(sorted(traced["peaks"]), 95)
+    result["entities"] = timing["entities"]
+    result["pools"] = {name: {"created": stats["created"], "peak_active": stats["peak_active"]}
+                       for name, stats in timing["pools"].items()}
+    return result
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, min_ms: float,
+            min_blocks: float = 0.5, min_bytes: int = 1024) -> List[str]:
+    regressions = []
+    for name, phases in current["scenarios"].items():
+        old_phases = baseline.get("scenarios", {}).get(name)
+        if not old_phases:
+            continue
+        for phase in PHASES:
+            for stat in ["p50", "p95"]:
+                old = old_phases[phase][stat]
+                new = phases[phase][stat]
+                if new - old > min_ms and new > old * (1 + threshold):
+                    regressions.append(f"{name}.{phase}.{stat}: {old:.3f} -> {new:.3f} ms (+{(new / old - 1) * 100 if old else 100:.0f}%)")
+        # Память: чистый прирост блоков сравниваем по абсолютной разнице, временный пик - как время
+        old_alloc = old_phases.get("alloc", {})
+        alloc = phases["alloc"]
+        old = old_alloc.get("net_blocks_per_frame")
+        new = alloc["net_blocks_per_frame"]
+        if old is not None and new - old > min_blocks:
+            regressions.append(f"{name}.alloc.net_blocks_per_frame: {old:.2f} -> {new:.2f}")
+        old = old_alloc.get("peak_transient_bytes_p95")
+        new = alloc["peak_transient_bytes_p95"]
+        if old is not None and new is not None and new - old > min_bytes and new > old * (1 + threshold):
+            regressions.append(f"{name}.alloc.peak_transient_bytes_p95: {old} -> {new}")
+        # Пулы: рост числа созданных объектов значит, что повторное использование перестало работать
+        for pool, stats in phases.get("pools", {}).items():
+            old_stats = old_phases.get("pools", {}).get(pool)
+            if old_stats and stats["created"] > old_stats["created"]:
+                regressions.append(f"{name}.pools.{pool}.created: {old_stats['created']} -> {stats['created']}")
+    return regressions
+
+
+def print_table(results: Dict):
+    print(f"{'сценарий':<12} {'фаза':<10} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, phases in results["scenarios"].items():
+        for phase in PHASES:
+            stats = phases[phase]
+            print(f"{name:<12} {phase:<10} {stats['p50']:8.3f} {stats['p95']:8.3f} {stats['p99']:8.3f}")
+        alloc = phases["alloc"]
+        print(f"{name:<12} {'alloc':<10} блоков/кадр {alloc['net_blocks_per_frame']:.2f}, пик байт p95 {alloc['peak_transient_bytes_p95']}")
+        pools = ", ".join(f"{pool} создано {stats['created']}" for pool, stats in phases["pools"].items())
+        print(f"{name:<12} {'pools':<10} {pools}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени кадра без окна")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="можно указать несколько раз")
+    parser.add_argument("--dirty-rects", action="store_true")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="scalar", help="грибы объектами или массивами numpy")
+    parser.add_argument("--no-trace", action="store_true", help="пропустить проход с tracemalloc")
+    parser.add_argument("--save", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="сравнить с сохраненным JSON: время p50/p95, прирост блоков и пик "
+                                          "памяти за кадр, число созданных объектов в пулах")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимый относительный рост времени")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="игнорировать рост меньше стольких мс")
+    parser.add_argument("--min-blocks", type=float, default=0.5,
+                        help="допустимый рост чистого числа блоков памяти за кадр")
+    parser.add_argument("--min-bytes", type=int, default=1024,
+                        help="игнорировать рост временного пика памяти меньше стольких байт")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "frames": args.frames,
+            "seed": args.seed,
+            "dirty_rects": args.dirty_rects,
+            "engine": args.engine,
+        },
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        results["scenarios"][name] = run_scenario(name, args.frames, args.seed, args.dirty_rects, not args.no_trace,
+                                                   args.engine)
+    print_table(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold, args.min_ms, args.min_blocks, args.min_bytes)
+        for line in regressions:
+            print("РЕГРЕССИЯ", line)
+        if regressions:
+            sys.exit(1)
+        print("Регрессий нет")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
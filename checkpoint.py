@@ -0,0 +1,223 @@
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from constants import *
+from game_objects import Character
+from simulation import Simulation
+from replay import Replay
+
+CHECKPOINT_PATH = "checkpoint.sav"
+MAGIC = b"MCHK"
+# 2: картинки грибов больше не тратят игровой ГСЧ
+VERSION = 2
+STATES = ["playing", "moving_forward"]
+MUSHROOM_STATES = ["idle", "moving", "attacking"]
+# магия, версия, зерно, длина уровня, тактов, счет, группа, группа побеждена, смещение фона, состояние,
+# грибов, мозгов, строк в таблице картинок
+HEADER = struct.Struct("<4sBQiIiIBiBHHB")
+# x, y, здоровье, макс. здоровье, перезарядка, направление, оружие, неуязвимость, мигание, прозрачность
+CHARACTER = struct.Struct("<iihhHbBHHB")
+# место в списке, x, y, большой, картинка, здоровье, очки, шанс мозга, скорость, перезарядка,
+# состояние, таймер, анимация смерти, прозрачность
+MUSHROOM = struct.Struct("<HiiBBhHdhHBhhB")
+# место в списке, x, y, время жизни
+BRAIN = struct.Struct("<HiiH")
+# Состояние Mersenne Twister: версия, 624 слова и позиция, есть ли gauss_next, gauss_next
+RNG = struct.Struct("<B625I?d")
+# Запись забега целиком, чтобы после продолжения ее можно было проверить с начала
+BLOB = struct.Struct("<I")
+
+
+def pack_text(text: str) -> bytes:
+    data = text.encode("utf-8")[:255]
+    return bytes([len(data)]) + data
+
+
+def unpack_text(data: bytes, pos: int) -> Tuple[str, int]:
+    size = data[pos]
+    return data[pos + 1:pos + 1 + size].decode("utf-8"), pos + 1 + size
+
+
+def dump(sim: Simulation, player_name: str = "", recording: Optional[Replay] = None) -> bytes:
+    # Только состояние забега: поверхности не пишем, спрайты находятся по ключу при отрисовке
+    character = sim.character
+    # Порядок индекса решает, кого первым заденет удар при равных x: пишем в нем, место в списке - полем
+    mushrooms = list(sim.mushroom_index)
+    brains = list(sim.brain_index)
+    images = sorted({mushroom.image_key[0] for mushroom in mushrooms})
+    image_ids = {path: i for i, path in enumerate(images)}
+    parts = [HEADER.pack(MAGIC, VERSION, sim.seed or 0, sim.max_background_offset, sim.ticks, sim.score,
+                         sim.current_group, sim.group_defeated, sim.background_offset, STATES.index(sim.game_state),
+                         len(mushrooms), len(brains), len(images)),
+             pack_text(character.char_type), pack_text(player_name)]
+    parts += [pack_text(path) for path in images]
+    parts.append(CHARACTER.pack(character.x, character.y, character.health, character.max_health,
+                                character.attack_cooldown, character.direction, character.current_weapon,
+                                character.invincible_timer, character.blink_timer, character.alpha))
+    for mushroom in mushrooms:
+        parts.append(MUSHROOM.pack(mushroom.slot, mushroom.x, mushroom.y, mushroom.is_big,
+                                   image_ids[mushroom.image_key[0]], mushroom.health, mushroom.points,
+                                   mushroom.brain_chance, mushroom.speed, mushroom.attack_cooldown,
+                                   MUSHROOM_STATES.index(mushroom.state), mushroom.state_timer,
+                                   mushroom.death_animation, mushroom.alpha))
+    for brain in brains:
+        parts.append(BRAIN.pack(brain.slot, brain.x, brain.y, brain.lifetime))
+    version, words, gauss = sim.rng.getstate()
+    parts.append(RNG.pack(version, *words, gauss is not None, gauss or 0.0))
+    blob = recording.to_bytes() if recording is not None else b""
+    parts.append(BLOB.pack(len(blob)))
+    parts.append(blob)
+    return b"".join(parts)
+
+
+def restore(sim: Simulation, data: bytes) -> Tuple[str, Optional[Replay]]:
+    (magic, version, seed, level_length, ticks, score, current_group, group_defeated, background_offset,
+     state, mushroom_count, brain_count, image_count) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Неизвестный формат сохранения")
+    pos = HEADER.size
+    char_type, pos = unpack_text(data, pos)
+    player_name, pos = unpack_text(data, pos)
+    images = []
+    for _ in range(image_count):
+        path, pos = unpack_text(data, pos)
+        images.append(path)
+    sim.reset(seed)
+    sim.max_background_offset = level_length
+    sim.ticks = ticks
+    sim.score = score
+    sim.current_group = current_group
+    sim.group_defeated = bool(group_defeated)
+    sim.background_offset = background_offset
+    sim.game_state = STATES[state]
+
+    character = Character(SCREEN_WIDTH//4, GROUND_HEIGHT, char_type)
+    (character.x, character.y, character.health, character.max_health, character.attack_cooldown,
+     character.direction, character.current_weapon, character.invincible_timer, character.blink_timer,
+     character.alpha) = CHARACTER.unpack_from(data, pos)
+    character.prev_x = character.x
+    character.rect.center = (character.x, character.y)
+    sim.character = character
+    pos += CHARACTER.size
+
+    # Объекты берутся из пулов; их конструкторы тратят случайные числа, но состояние ГСЧ восстанавливается последним
+    mushrooms = []
+    for _ in range(mushroom_count):
+        (slot, x, y, is_big, image, health, points, brain_chance, speed, attack_cooldown, mushroom_state,
+         state_timer, death_animation, alpha) = MUSHROOM.unpack_from(data, pos)
+        pos += MUSHROOM.size
+        mushroom = sim.mushroom_pool.acquire(x, y, bool(is_big), sim.rng, sim.skin_rng)
+        mushroom.place(x, y, mushroom.width, mushroom.height, images[image], mushroom.image_key[4])
+        mushroom.health = health
+        mushroom.points = points
+        mushroom.brain_chance = brain_chance
+        mushroom.speed = speed
+        mushroom.attack_cooldown = attack_cooldown
+        mushroom.state = MUSHROOM_STATES[mushroom_state]
+        mushroom.state_timer = state_timer
+        mushroom.death_animation = death_animation
+        mushroom.alpha = alpha
+        sim.mushroom_index.insert(mushroom, x)
+        mushrooms.append((slot, mushroom))
+    for slot, mushroom in sorted(mushrooms, key=lambda item: item[0]):
+        sim.mushrooms.add(mushroom)
+
+    brains = []
+    for _ in range(brain_count):
+        slot, x, y, lifetime = BRAIN.unpack_from(data, pos)
+        pos += BRAIN.size
+        brain = sim.brain_pool.acquire(x, y)
+        brain.lifetime = lifetime
+        sim.brain_index.insert(brain, x)
+        brains.append((slot, brain))
+    for slot, brain in sorted(brains, key=lambda item: item[0]):
+        sim.brains.add(brain)
+
+    version, *words, has_gauss, gauss = RNG.unpack_from(data, pos)
+    sim.rng.setstate((version, tuple(words), gauss if has_gauss else None))
+    pos += RNG.size
+    size, = BLOB.unpack_from(data, pos)
+    pos += BLOB.size
+    recording = Replay.from_bytes(data[pos:pos + size]) if size else None
+    return player_name, recording
+
+
+def read(path: str = CHECKPOINT_PATH) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class CheckpointWriter:
+    # Сериализация идет в кадре (десятки микросекунд), запись на диск - в фоновом потоке
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-writer")
+        self.serialized = 0
+        self.saved = 0
+        self.failed = 0
+        self.last_error = ""
+        self.bytes = 0
+        self.serialize_seconds = 0.0
+        self.write_seconds = 0.0
+        self.last_size = 0
+
+    def save(self, sim: Simulation, player_name: str = "", recording: Optional[Replay] = None):
+        started = time.perf_counter()
+        data = dump(sim, player_name, recording)
+        self.serialize_seconds += time.perf_counter() - started
+        self.serialized += 1
+        self.bytes += len(data)
+        self.last_size = len(data)
+        self._executor.submit(self._write, data)
+
+    def _write(self, data: bytes):
+        started = time.perf_counter()
+        # Сначала во временный файл: сбой посреди записи не портит прошлое сохранение
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            # Диск полон, папка только для чтения, неверный путь: сообщаем один раз, считаем все
+            if not self.failed:
+                print(f"Не удалось записать сохранение {self.path}: {e}")
+            self.failed += 1
+            self.last_error = str(e)
+            return
+        self.saved += 1
+        self.write_seconds += time.perf_counter() - started
+
+    def remove(self):
+        # Забег закончен, продолжать нечего; в очереди после уже отправленных записей
+        self._executor.submit(self._remove)
+
+    def _remove(self):
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except OSError as e:
+            print(f"Не удалось удалить сохранение {self.path}: {e}")
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, float]:
+        serialized = self.serialized or 1
+        return {
+            "serialized": self.serialized,
+            "saved": self.saved,
+            "failed": self.failed,
+            "last_error": self.last_error,
+            "bytes_mean": self.bytes / serialized,
+            "last_bytes": self.last_size,
+            "serialize_us_mean": self.serialize_seconds / serialized * 1e6,
+            "write_ms_mean": self.write_seconds / (self.saved or 1) * 1000,
+        }
@@ -1,14 +1,17 @@
 import pygame
 import os
 
-pygame.init()
-pygame.font.init()
-
 # Константы экрана
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 GROUND_HEIGHT = 500
 FPS = 60
+# Симуляция идет фиксированными тактами независимо от частоты отрисовки
+TICK_RATE = 60
+# Больше тактов за кадр не догоняем, иначе долгий кадр тянет за собой следующий
+MAX_CATCH_UP_TICKS = 5
+# Частота опроса событий на неподвижных экранах меню
+MENU_FPS = 20
 
 # Цвета
 WHITE = (255, 255, 255)
@@ -36,15 +39,18 @@ WEAPONS_DIR = os.path.join(ASSETS_DIR, "weapons")
 UI_DIR = os.path.join(ASSETS_DIR, "ui")
 EFFECTS_DIR = os.path.join(ASSETS_DIR, "effects")
 
-# Создание директорий при необходимости
-os.makedirs(BACKGROUNDS_DIR, exist_ok=True)
-os.makedirs(CHARACTERS_DIR, exist_ok=True)
-os.makedirs(MUSHROOMS_DIR, exist_ok=True)
-os.makedirs(WEAPONS_DIR, exist_ok=True)
-os.makedirs(UI_DIR, exist_ok=True)
-os.makedirs(EFFECTS_DIR, exist_ok=True)
-
-# Шрифты
-font_small = pygame.font.SysFont('Arial', 18)
-font_medium = pygame.font.SysFont('Arial', 24)
-font_large = pygame.font.SysFont('Arial', 32)
\ No newline at end of file
+# Шрифты создаются при первом обращении: поиск SysFont заметно замедляет запуск
+class Fonts:
+    SIZES = {"small": 18, "medium": 24, "large": 32}
+
+    def __getattr__(self, name: str) -> pygame.font.Font:
+        if name not in self.SIZES:
+            raise AttributeError(name)
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.SysFont('Arial', self.SIZES[name])
+        setattr(self, name, font)
+        return font
+
+
+fonts = Fonts()
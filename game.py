@@ -1,19 +1,52 @@
 import pygame
+import random
 import sys
 import os
-import json
-import random
-from typing import List, Dict
+import struct
+import time
+from typing import Callable, List, Dict, Optional, Tuple
 from constants import *
 from game_objects import *
+from assets import assets, texts, AssetLoader, AtlasKey
+from simulation import Simulation, TickInput, IDLE_INPUT, CHAR_TYPES
+from leaderboard_store import LeaderboardStore
+from backgrounds import TiledBackground, load_background
+from replay import Replay, check
+from profiler import profiler
+from allocations import allocations
+from render_queue import RenderQueue, LAYER_EFFECTS, LAYER_HUD
+from spectator import StateBroadcaster
+from latency import LatencyTracker, FramePacer
+import checkpoint
+from checkpoint import CheckpointWriter, CHECKPOINT_PATH
+
+WEAPON_KEYS = [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4]
+STATIC_STATES = ["character_select", "game_over", "leaderboard"]
+# Первые плитки этих фонов готовятся еще на экране загрузки
+PRELOADED_BACKGROUNDS = ["forest", "leaderboard"]
+USED_KEYS = set(WEAPON_KEYS) | {pygame.K_5, pygame.K_6, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE,
+                                pygame.K_ESCAPE, pygame.K_RETURN, pygame.K_l, pygame.K_F3, pygame.K_F4}
+ALLOWED_EVENTS = [pygame.QUIT, pygame.KEYDOWN, pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED]
 
-class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+class Game(Simulation):
+    def __init__(self, dirty_rects: bool = False, profile: bool = False, profile_export: str = "",
+                 level_length: int = 2400, record: bool = True, replay: Optional[Replay] = None,
+                 render_mode: str = "throttled", render_fps: int = FPS, spectate_port: int = 0,
+                 low_latency: bool = False, checkpoint_path: str = CHECKPOINT_PATH,
+                 checkpoint_seconds: float = 10, resume: bool = False, trace_alloc: bool = False):
+        created = time.perf_counter()
+        super().__init__()
+        self.max_background_offset = level_length
+        # Полный pygame.init() не нужен: звук игра не использует, шрифты инициализируются по требованию
+        pygame.display.init()
+        # Отрисовка: throttled - не чаще render_fps, vsync - по кадровой развертке, uncapped - без ограничений
+        self.render_mode = render_mode
+        self.render_fps = render_fps
+        self.screen = self.open_window()
         pygame.display.set_caption("Грибное приключение")
         self.clock = pygame.time.Clock()
         self.running = True
-        self.max_background_offset = 2400
         self.loading_hints = [
             "Используйте стрелки влево/вправо для движения",
             "Нажмите SPACE для атаки",
@@ -24,60 +57,101 @@ class Game:
         ]
         self.current_hint = 0
         self.hint_timer = 0
-        self.background = self.load_background("forest")
-        self.loading_bg = self.load_background("loading")
-        self.leaderboard_bg = self.load_background("leaderboard")
-        self.character = None
-        self.mushrooms = []
-        self.brains = []
-        self.current_group = 0
-        self.group_defeated = True
-        self.background_offset = 0
+        # Фоны нарезаны на плитки: декодируются по мере прокрутки, forest заранее готовится на экране загрузки
+        self.backgrounds: Dict[str, TiledBackground] = {}
+        self.loader = None
         arrow_y = SCREEN_HEIGHT // 2 - ARROW_HEIGHT // 2
         self.left_arrow = ArrowButton(50, arrow_y, "left")
         self.right_arrow = ArrowButton(SCREEN_WIDTH - 50, arrow_y, "right")
-        self.score = 0
         self.game_state = "loading"
         self.player_name = ""
         self.loading_progress = 0
-        self.leaderboard = self.load_leaderboard()
+        self.leaderboard_store = LeaderboardStore()
+        self.leaderboard = self.leaderboard_store.top(10)
+        self.hud_cache = {}
+        self.pending_attack = False
+        self.pending_pause = False
+        # Режим грязных прямоугольников: перерисовываем только изменившиеся области
+        self.dirty_rects = dirty_rects
+        self.dirty_prev = None
+        self.update_rects = None
+        self.static_layer = None
+        self.static_offset = None
+        # Очередь отрисовки по слоям; (отправлено, отсечено) за последний кадр
+        self.render_queue = RenderQueue(self.screen.get_rect())
+        self.render_counts = (0, 0)
+        self.attack_marker_surface = None
+        self.game_over_overlay = None
+        # Профилировщик кадра: F3 - оверлей, F4 - выгрузка в CSV/JSON
+        profiler.enabled = profiler.enabled or profile
+        self.profile_export = profile_export
+        self.show_profiler = False
+        self.profiler_panel = None
+        self.profiler_lines = []
+        self.startup_timings = {}
+        # Выделения памяти по фазам кадра и строкам (tracemalloc), отчет при выходе
+        if trace_alloc:
+            allocations.start()
+        self.pending_timing = ("first_frame_ms", created)
+        # Доля такта, прошедшая после последнего обновления: позиции на экране интерполируются
+        self.interpolation = 1.0
+        self.prev_offset = 0
+        self.dropped_ticks = 0
+        # Меню и экраны итогов собираются в поверхность один раз при входе или смене данных
+        self.static_screens: Dict[str, Tuple[Tuple, pygame.Surface]] = {}
+        self.static_shown = None
+        self.leaderboard_version = 0
+        # Трансляция состояния зрителям по локальному UDP-сокету
+        self.broadcaster = None
+        if spectate_port:
+            try:
+                self.broadcaster = StateBroadcaster(spectate_port)
+            except OSError as e:
+                print(f"Трансляция недоступна на порту {spectate_port} ({e}), играем без нее")
+        # Задержка от нажатия до кадра, где виден результат, по типам ввода
+        self.latency = LatencyTracker()
+        self.low_latency = low_latency
+        self.pacer = None
+        if low_latency:
+            # В очередь попадают только события, которые игра обрабатывает
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed(ALLOWED_EVENTS)
+            self.pacer = FramePacer(self.render_mode == "vsync")
+        # Запись забега: зерно и ввод по тактам; при воспроизведении ввод берется из записи
+        self.record = record
+        self.recording = None
+        self.replay = replay
+        self.replay_inputs = None
+        if replay is not None:
+            self.max_background_offset = replay.level_length
+        # Сохранение забега: раз в checkpoint_seconds и при выходе; после победы или смерти файл удаляется
+        # Воспроизведение записи не сохраняется и не трогает сохранение живого забега
+        self.checkpoints = CheckpointWriter(checkpoint_path) if checkpoint_seconds > 0 and replay is None else None
+        self.checkpoint_ticks = max(1, round(checkpoint_seconds * TICK_RATE))
+        self.resume_data = None
+        if resume and replay is None:
+            self.resume_data = checkpoint.read(checkpoint_path)
+            if self.resume_data is None:
+                print(f"Нет сохранения {checkpoint_path}, начинаем новый забег")
 
-    def load_background(self, bg_type: str) -> pygame.Surface:
-        bg_images = [f for f in os.listdir(BACKGROUNDS_DIR) if f.startswith(bg_type) and f.endswith(('.png', '.jpg', '.jpeg'))]
-        if bg_images:
-            bg = pygame.image.load(os.path.join(BACKGROUNDS_DIR, bg_images[0]))
-            return pygame.transform.scale(bg, (self.max_background_offset, SCREEN_HEIGHT)).convert()
-        else:
-            surf = pygame.Surface((self.max_background_offset, SCREEN_HEIGHT))
-            color1 = PURPLE if bg_type == "loading" else (BLUE if bg_type == "leaderboard" else GREEN)
-            color2 = BLACK if bg_type == "forest" else (100, 100, 100)
-            surf.fill(color1)
-            pygame.draw.rect(surf, color2, (0, GROUND_HEIGHT, self.max_background_offset, SCREEN_HEIGHT - GROUND_HEIGHT))
-            return surf
-
-    def load_leaderboard(self) -> List[Dict]:
-        leaderboard_file = "leaderboard.json"
-        default_data = []
-        if not os.path.exists(leaderboard_file):
-            with open(leaderboard_file, 'w') as f:
-                json.dump(default_data, f)
-            return default_data
-        try:
-            with open(leaderboard_file, 'r') as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    return data
-                return default_data
-        except (json.JSONDecodeError, IOError):
-            print("Ошибка чтения таблицы лидеров, создаем новую")
-            return default_data
-
-    def save_leaderboard(self):
-        try:
-            with open("leaderboard.json", 'w') as f:
-                json.dump(self.leaderboard, f, indent=4)
-        except IOError:
-            print("Ошибка сохранения таблицы лидеров")
+    def open_window(self) -> pygame.Surface:
+        if self.render_mode == "vsync":
+            try:
+                return pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SCALED, vsync=1)
+            except pygame.error:
+                print("Вертикальная синхронизация недоступна, ограничиваем частоту кадров")
+                self.render_mode = "throttled"
+        return pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    def get_background(self, bg_type: str) -> TiledBackground:
+        bg = self.backgrounds.get(bg_type)
+        if bg is None:
+            bg = load_background(bg_type)
+            self.backgrounds[bg_type] = bg
+        return bg
+
+    def draw_background(self, surface: pygame.Surface, bg_type: str, offset: int = 0):
+        self.get_background(bg_type).draw(surface, offset)
 
     def add_to_leaderboard(self, name: str, score: int):
         if not name:
@@ -87,162 +161,364 @@ class Game:
             "score": score,
             "character": self.character.char_type if self.character else "Unknown"
         }
-        self.leaderboard.append(new_entry)
-        self.leaderboard.sort(key=lambda x: x["score"], reverse=True)
-        self.leaderboard = self.leaderboard[:10]
-        self.save_leaderboard()
-
-    def spawn_mushroom_group(self):
-        group_size = random.randint(3, 6)
-        start_x = self.background_offset + SCREEN_WIDTH + 100
-        has_big = random.random() < 0.3
-        for i in range(group_size):
-            x = start_x + i * 100
-            is_big = has_big and (i == group_size - 1)
-            mushroom = Mushroom(x, GROUND_HEIGHT, is_big)
-            mushroom.state_timer = random.randint(30, 90)
-            self.mushrooms.append(mushroom)
-        self.group_defeated = False
-        self.current_group += 1
+        # Запись в базу идет в фоновом потоке, кадр не ждет диска
+        self.leaderboard_store.add(new_entry["name"], new_entry["score"], new_entry["character"])
+        self.leaderboard = self.leaderboard_store.top(10)
+        self.leaderboard_version += 1
+
+    def on_game_over(self):
+        if self.replay_inputs is None:
+            self.add_to_leaderboard(self.player_name, self.score)
+
+    def start(self, char_type: str):
+        # Каждый забег идет с явным зерном, иначе его нельзя воспроизвести
+        seed = self.replay.seed if self.replay is not None else random.getrandbits(32)
+        self.reseed(seed)
+        super().start(char_type)
+        if self.replay is not None:
+            self.replay_inputs = self.replay.inputs()
+        elif self.record:
+            self.recording = Replay(seed, char_type, self.player_name, self.max_background_offset)
+
+    def save_checkpoint(self):
+        if self.checkpoints is not None and self.replay_inputs is None:
+            t = profiler.start()
+            self.checkpoints.save(self, self.player_name, self.recording)
+            profiler.stop("checkpoint", t)
+
+    def resume(self, data: bytes) -> bool:
+        started = time.perf_counter()
+        try:
+            player_name, recording = checkpoint.restore(self, data)
+        except (ValueError, IndexError, struct.error) as e:
+            print(f"Сохранение не прочитано ({e}), начинаем новый забег")
+            self.reset()
+            return False
+        self.player_name = player_name
+        self.recording = recording if self.record else None
+        self.prev_offset = self.background_offset
+        self.startup_timings["resume_ms"] = (time.perf_counter() - started) * 1000
+        print(f"Забег продолжен: {len(data)} байт за {self.startup_timings['resume_ms']:.2f} мс")
+        return True
+
+    def finish_run(self):
+        if self.checkpoints is not None and self.replay_inputs is None:
+            self.checkpoints.remove()
+        if self.recording is not None:
+            self.recording.score = self.score
+            path = self.recording.save_to_dir()
+            print(f"Забег записан: {path}")
+            self.recording = None
+        if self.replay_inputs is not None:
+            errors = check(self.replay, self.score, self.ticks)
+            print("Воспроизведение совпало с записью" if not errors else "Расхождение с записью: " + "; ".join(errors))
+            self.replay = None
+            self.replay_inputs = None
 
     def run(self):
         self.loading_progress = 0
+        tick_seconds = 1 / TICK_RATE
+        # Первый кадр сразу получает такт
+        accumulator = tick_seconds
+        previous = time.perf_counter()
         while self.running:
-            self.handle_events()
-            if self.game_state == "loading":
-                self.update_loading()
-                self.draw_loading_screen()
-            elif self.game_state == "character_select":
-                self.draw_character_select()
-            elif self.game_state in ["playing", "moving_forward"]:
-                self.update_game()
-                self.draw_game()
-            elif self.game_state == "game_over":
-                self.draw_game_over()
-            elif self.game_state == "leaderboard":
-                self.draw_leaderboard()
-            pygame.display.flip()
-            self.clock.tick(FPS)
+            if self.pacer is not None:
+                t = profiler.start()
+                self.pacer.wake()
+                profiler.stop("pacing", t)
+            frame_start = profiler.start()
+            now = time.perf_counter()
+            accumulator += now - previous
+            previous = now
+            allocations.frame(self.game_state)
+            with allocations.scope("events"):
+                self.handle_events()
+            with allocations.scope("update"):
+                ticks = 0
+                while accumulator >= tick_seconds and ticks < MAX_CATCH_UP_TICKS:
+                    self.update_tick()
+                    accumulator -= tick_seconds
+                    ticks += 1
+                if accumulator >= tick_seconds:
+                    # Не успеваем: отбрасываем отставание, игра замедляется вместо лавины тактов
+                    self.dropped_ticks += int(accumulator / tick_seconds)
+                    accumulator %= tick_seconds
+            self.interpolation = accumulator / tick_seconds
+            with allocations.scope("draw"):
+                self.draw_screen()
+            if self.pacer is not None:
+                self.pacer.hold()
+            with allocations.scope("present"):
+                self.present()
+            self.latency.presented()
+            if self.pending_timing:
+                name, started = self.pending_timing
+                self.startup_timings[name] = (time.perf_counter() - started) * 1000
+                self.pending_timing = None
+            profiler.stop("frame", frame_start)
+            with allocations.scope("tick"):
+                if self.pacer is not None:
+                    self.pacer.presented(self.frame_period())
+                elif self.game_state in STATIC_STATES:
+                    # Экран не меняется до нажатия клавиши: редкие кадры только для опроса событий
+                    self.clock.tick(MENU_FPS)
+                else:
+                    self.clock.tick(self.render_fps if self.render_mode == "throttled" else 0)
+            profiler.end_frame()
+        self.close_services()
+        self.report_stats()
+        self.leaderboard_store.close()
         pygame.quit()
         sys.exit()
 
+    def draw_screen(self):
+        if self.game_state == "loading":
+            self.draw_loading_screen()
+        elif self.game_state == "character_select":
+            self.draw_character_select()
+        elif self.game_state in ["playing", "moving_forward"]:
+            self.draw_game()
+        elif self.game_state == "game_over":
+            self.draw_game_over()
+        elif self.game_state == "leaderboard":
+            self.draw_leaderboard()
+        if self.show_profiler:
+            self.draw_profiler_overlay()
+
+    def close_services(self):
+        # Последнее сохранение и остановка фоновых потоков до отчета, чтобы в нем были все записи
+        if self.checkpoints is not None:
+            if self.game_state in ["playing", "moving_forward"]:
+                self.save_checkpoint()
+            self.checkpoints.close()
+        if self.broadcaster is not None:
+            self.broadcaster.close()
+
+    def report_stats(self):
+        if profiler.enabled:
+            for name, value in self.startup_timings.items():
+                print(f"{name}: {value:.1f}")
+            print(f"dropped_ticks: {self.dropped_ticks}")
+        if profiler.enabled or self.low_latency:
+            for line in self.latency.report():
+                print(line)
+        if self.profile_export:
+            self.export_profile(self.profile_export)
+        if allocations.enabled:
+            for line in allocations.report():
+                print(line)
+            allocations.stop()
+        if self.checkpoints is not None:
+            stats = self.checkpoints.stats()
+            if stats["serialized"]:
+                print(f"сохранения: {stats['saved']} из {stats['serialized']}, {stats['bytes_mean']:.0f} байт, "
+                      f"сериализация {stats['serialize_us_mean']:.0f} мкс, запись {stats['write_ms_mean']:.2f} мс")
+            if stats["failed"]:
+                print(f"ОШИБКА: {stats['failed']} сохранений не записано, последняя ошибка: {stats['last_error']}; "
+                      f"файл {self.checkpoints.path} устарел или отсутствует")
+        if self.broadcaster is not None:
+            stats = self.broadcaster.stats()
+            print(f"трансляция: {stats['bytes_per_tick']:.0f} байт/такт, "
+                  f"{stats['serialize_us_per_tick']:.0f} мкс/такт на сериализацию, "
+                  f"полных снимков {stats['full_messages']} из {stats['messages']}")
+
+    def frame_period(self) -> float:
+        if self.game_state in STATIC_STATES:
+            return 1 / MENU_FPS
+        return 1 / self.render_fps if self.render_mode == "throttled" else 0.0
+
     def handle_events(self):
+        arrival = self.latency.poll()
         for event in pygame.event.get():
+            if self.low_latency and event.type == pygame.KEYDOWN and event.key not in USED_KEYS:
+                continue
             if event.type == pygame.QUIT:
                 self.running = False
-            if event.type == pygame.KEYDOWN:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.show_profiler = not self.show_profiler
+                profiler.enabled = profiler.enabled or self.show_profiler
+                self.dirty_prev = None
+                self.static_shown = None
+            elif event.type in [pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED]:
+                self.static_shown = None
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.export_profile(time.strftime("profile_%Y%m%d_%H%M%S"))
+            elif event.type == pygame.KEYDOWN:
+                state = self.game_state
                 if self.game_state == "loading":
-                    if self.loading_progress < 100:
-                        self.loading_progress = 100
+                    # Пропуск экрана загрузки: дожидаемся оставшихся файлов сразу
+                    if self.loader is not None:
+                        self.loader.wait()
                 elif self.game_state == "character_select":
-                    char_types = ["elf", "witch", "warrior", "bard", "healer", "student"]
                     if pygame.K_1 <= event.key <= pygame.K_6:
                         char_index = event.key - pygame.K_1
-                        self.character = Character(SCREEN_WIDTH//4, GROUND_HEIGHT, char_types[char_index])
                         self.player_name = ["Эльф", "Ведьма", "Воин", "Бард", "Лекарша", "Студентка"][char_index]
-                        self.game_state = "playing"
-                        self.spawn_mushroom_group()
+                        self.start(CHAR_TYPES[char_index])
                 elif self.game_state == "playing":
+                    # Атака и пауза применяются симуляцией на ближайшем такте
                     if event.key == pygame.K_SPACE and self.character:
-                        attack_result = self.character.attack()
-                        if attack_result:
-                            for mushroom in self.mushrooms[:]:
-                                attack_pos = self.character.x + self.character.direction * attack_result["range"]
-                                if abs(mushroom.x - attack_pos) < 30:
-                                    destroyed, brain_drop = mushroom.take_damage(attack_result["damage"])
-                                    if destroyed:
-                                        self.score += mushroom.points
-                                        if brain_drop:
-                                            self.brains.append(Brain(mushroom.x, mushroom.y))
+                        self.pending_attack = True
+                        self.latency.input("attack", arrival)
                     elif event.key == pygame.K_ESCAPE:
-                        self.game_state = "game_over"
+                        self.pending_pause = True
+                        self.latency.input("pause", arrival)
+                    elif event.key in [pygame.K_LEFT, pygame.K_RIGHT]:
+                        self.latency.input("move", arrival)
+                    elif event.key in WEAPON_KEYS:
+                        self.latency.input("weapon", arrival)
                 elif self.game_state == "game_over":
                     if event.key == pygame.K_RETURN:
-                        self.__init__()
-                        self.game_state = "character_select"
+                        self.pending_timing = ("restart_ms", time.perf_counter())
+                        self.reset()
                     elif event.key == pygame.K_l:
                         self.game_state = "leaderboard"
                 elif self.game_state == "leaderboard" and event.key == pygame.K_ESCAPE:
                     self.game_state = "game_over"
+                if self.game_state != state:
+                    # Смена экрана видна уже в ближайшем кадре
+                    self.latency.input("menu", arrival)
+                    self.latency.apply("menu")
+
+    def asset_manifest(self) -> List[AtlasKey]:
+        atlases = []
+        for char_type in CHAR_TYPES:
+            atlases += Character.image_keys(char_type)
+        return atlases + Mushroom.image_keys() + Brain.image_keys() + ArrowButton.image_keys()
 
     def update_loading(self):
-        self.loading_progress += 0.5
+        if self.loader is None:
+            self.loader = AssetLoader(assets, self.asset_manifest())
+            for bg_type in PRELOADED_BACKGROUNDS:
+                self.get_background(bg_type).prefetch(0)
+        self.loader.poll()
+        self.loading_progress = self.loader.progress
         self.hint_timer += 1
         if self.hint_timer >= 180:
             self.hint_timer = 0
             self.current_hint = (self.current_hint + 1) % len(self.loading_hints)
-        if self.loading_progress >= 100:
+        if self.loader.done and all(self.get_background(bg_type).ready(0) for bg_type in PRELOADED_BACKGROUNDS):
             self.game_state = "character_select"
+            if self.resume_data is not None:
+                self.resume(self.resume_data)
+                self.resume_data = None
+            elif self.replay is not None:
+                self.player_name = self.replay.player_name
+                self.start(self.replay.char_type)
+            # Экран загрузки больше не покажется, его плитки не нужны
+            self.backgrounds.pop("loading", None)
+
+    def reset(self, seed: Optional[int] = None):
+        # Рестарт: сбрасываем только состояние забега, окно, фоны, пулы и таблица лидеров остаются
+        super().reset(seed)
+        self.game_state = "character_select"
+        self.player_name = ""
+        self.pending_attack = False
+        self.pending_pause = False
+        self.left_arrow.is_pressed = False
+        self.right_arrow.is_pressed = False
+        self.dirty_prev = None
+        self.recording = None
+
+    def read_input(self) -> TickInput:
+        keys = pygame.key.get_pressed()
+        weapon = -1
+        for i, key in enumerate(WEAPON_KEYS):
+            if keys[key]:
+                weapon = i
+                break
+        inp = TickInput(keys[pygame.K_LEFT], keys[pygame.K_RIGHT], self.pending_attack, weapon, self.pending_pause)
+        self.pending_attack = False
+        self.pending_pause = False
+        latency = self.latency
+        if inp.attack:
+            latency.apply("attack")
+        if inp.pause:
+            latency.apply("pause")
+        if inp.left or inp.right:
+            latency.apply("move")
+        else:
+            latency.discard("move")
+        if weapon >= 0:
+            latency.apply("weapon")
+        else:
+            latency.discard("weapon")
+        return inp
+
+    def update_tick(self):
+        if self.game_state == "loading":
+            self.update_loading()
+        elif self.game_state in ["playing", "moving_forward"]:
+            self.update_game()
+            if self.ticks % self.checkpoint_ticks == 0 and self.game_state in ["playing", "moving_forward"]:
+                self.save_checkpoint()
+            if self.broadcaster is not None:
+                t = profiler.start()
+                self.broadcaster.publish(self, self.game_state)
+                profiler.stop("broadcast", t)
+
+    def snapshot(self):
+        # Позиции до такта - начальная точка интерполяции при отрисовке
+        self.prev_offset = self.background_offset
+        if self.character:
+            self.character.prev_x = self.character.x
+        for mushroom in self.mushrooms:
+            mushroom.prev_x = mushroom.x
+
+    def view_offset(self) -> int:
+        blend = self.interpolation
+        if blend >= 1:
+            return self.background_offset
+        return round(self.prev_offset + (self.background_offset - self.prev_offset) * blend)
 
     def update_game(self):
+        self.snapshot()
+        inp = self.read_input()
+        if self.replay_inputs is not None:
+            inp = next(self.replay_inputs, IDLE_INPUT)
+        elif self.recording is not None:
+            self.recording.record(inp)
         if self.character:
-            self.character.update()
-            keys = pygame.key.get_pressed()
-            self.left_arrow.is_pressed = keys[pygame.K_LEFT]
-            self.right_arrow.is_pressed = keys[pygame.K_RIGHT]
-            if keys[pygame.K_1]:
-                self.character.current_weapon = 0
-            elif keys[pygame.K_2]:
-                self.character.current_weapon = 1
-            elif keys[pygame.K_3]:
-                self.character.current_weapon = 2
-            elif keys[pygame.K_4]:
-                self.character.current_weapon = 3
-        if self.game_state == "playing":
-            active_mushrooms = 0
-            for mushroom in self.mushrooms[:]:
-                if mushroom.is_dead():
-                    self.mushrooms.remove(mushroom)
-                    continue
-                mushroom.update(self.character.x if self.character else SCREEN_WIDTH//2)
-                if mushroom.is_attacking() and self.character and abs(mushroom.x - self.character.x) < 50:
-                    if self.character.take_damage():
-                        if self.character.health <= 0:
-                            self.game_state = "game_over"
-                            self.add_to_leaderboard(self.player_name, self.score)
-                if mushroom.health > 0 and mushroom.death_animation <= 0:
-                    active_mushrooms += 1
-            for brain in self.brains[:]:
-                if brain.update():
-                    self.brains.remove(brain)
-                elif self.character and pygame.sprite.collide_rect(self.character, brain):
-                    self.score += 100
-                    self.brains.remove(brain)
-            if active_mushrooms == 0 and len(self.mushrooms) > 0:
-                self.mushrooms = []
-                self.group_defeated = True
-                self.game_state = "moving_forward"
-            if self.group_defeated and len(self.mushrooms) == 0:
-                self.spawn_mushroom_group()
-        elif self.game_state == "moving_forward":
-            if self.character:
-                self.character.x += self.character.speed
-                self.background_offset += self.character.speed
-                if self.character.x >= SCREEN_WIDTH // 2:
-                    self.character.x = SCREEN_WIDTH // 4
-                    self.game_state = "playing"
-                if self.background_offset >= self.max_background_offset - SCREEN_WIDTH:
-                    self.background_offset = self.max_background_offset - SCREEN_WIDTH
-                    self.game_state = "game_over"
-                    self.add_to_leaderboard(self.player_name, self.score)
+            self.left_arrow.is_pressed = inp.left
+            self.right_arrow.is_pressed = inp.right
+        self.step(inp)
+        if self.game_state == "game_over":
+            self.finish_run()
 
     def draw_loading_screen(self):
-        self.screen.blit(self.loading_bg, (0, 0))
+        self.static_shown = None
+        self.draw_background(self.screen, "loading")
         progress = min(100, self.loading_progress)
         pygame.draw.rect(self.screen, WHITE, (SCREEN_WIDTH//2 - 150, GROUND_HEIGHT - 20, 300, 20), 2)
         pygame.draw.rect(self.screen, YELLOW, (SCREEN_WIDTH//2 - 150, GROUND_HEIGHT - 20, 300 * progress / 100, 20))
-        loading_text = font_large.render("Загрузка...", True, WHITE)
+        loading_text = texts.render(fonts.large, "Загрузка...")
         self.screen.blit(loading_text, (SCREEN_WIDTH//2 - loading_text.get_width()//2, GROUND_HEIGHT - 70))
-        hint_text = font_medium.render(self.loading_hints[self.current_hint], True, WHITE)
+        hint_text = texts.render(fonts.medium, self.loading_hints[self.current_hint])
         self.screen.blit(hint_text, (SCREEN_WIDTH//2 - hint_text.get_width()//2, GROUND_HEIGHT + 50))
-        percent_text = font_medium.render(f"{progress}%", True, WHITE)
+        percent_text = texts.render(fonts.medium, f"{int(progress)}%")
         self.screen.blit(percent_text, (SCREEN_WIDTH//2 - percent_text.get_width()//2, GROUND_HEIGHT + 10))
 
+    def draw_static(self, state: str, key: Tuple, compose: Callable[[pygame.Surface], None]):
+        cached = self.static_screens.get(state)
+        if cached is None or cached[0] != key:
+            surface = cached[1] if cached else pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+            compose(surface)
+            cached = (key, surface)
+            self.static_screens[state] = cached
+        if self.static_shown != (state, key) or self.show_profiler:
+            self.screen.blit(cached[1], (0, 0))
+            self.static_shown = (state, key)
+        else:
+            # Кадр уже на экране, обновлять нечего
+            self.update_rects = []
+
     def draw_character_select(self):
-        self.screen.blit(self.background, (-self.background_offset, 0))
-        pygame.draw.rect(self.screen, BLACK, (0, GROUND_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_HEIGHT))
-        title_text = font_large.render("Выберите персонажа", True, WHITE)
-        self.screen.blit(title_text, (SCREEN_WIDTH//2 - title_text.get_width()//2, 50))
+        self.draw_static("character_select", (self.background_offset,), self.compose_character_select)
+
+    def compose_character_select(self, surface: pygame.Surface):
+        self.draw_background(surface, "forest", self.background_offset)
+        pygame.draw.rect(surface, BLACK, (0, GROUND_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_HEIGHT))
+        title_text = texts.render(fonts.large, "Выберите персонажа")
+        surface.blit(title_text, (SCREEN_WIDTH//2 - title_text.get_width()//2, 50))
         characters = [
             {"name": "Эльф", "key": pygame.K_1},
             {"name": "Ведьма", "key": pygame.K_2},
@@ -253,69 +529,174 @@ class Game:
         ]
         for i, char in enumerate(characters):
             y_pos = 120 + i * 60
-            char_text = font_medium.render(f"{i+1}. {char['name']}", True, WHITE)
-            self.screen.blit(char_text, (SCREEN_WIDTH//2 - char_text.get_width()//2, y_pos))
-        hint_text = font_small.render("Нажмите цифру от 1 до 6 для выбора персонажа", True, WHITE)
-        self.screen.blit(hint_text, (SCREEN_WIDTH//2 - hint_text.get_width()//2, SCREEN_HEIGHT - 50))
+            char_text = texts.render(fonts.medium, f"{i+1}. {char['name']}")
+            surface.blit(char_text, (SCREEN_WIDTH//2 - char_text.get_width()//2, y_pos))
+        hint_text = texts.render(fonts.small, "Нажмите цифру от 1 до 6 для выбора персонажа")
+        surface.blit(hint_text, (SCREEN_WIDTH//2 - hint_text.get_width()//2, SCREEN_HEIGHT - 50))
 
     def draw_game(self):
-        self.screen.blit(self.background, (-self.background_offset, 0))
-        pygame.draw.rect(self.screen, BLACK, (0, GROUND_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_HEIGHT))
+        self.static_shown = None
+        t = profiler.start()
+        blend = self.interpolation
+        offset = self.view_offset()
+        partial = (self.dirty_rects and self.game_state == "playing" and self.dirty_prev is not None
+                   and self.static_offset == offset and not self.show_profiler)
+        if partial:
+            for rect in self.dirty_prev:
+                self.screen.blit(self.static_layer, rect, rect)
+        elif self.dirty_rects:
+            self.refresh_static_layer(offset)
+            self.screen.blit(self.static_layer, (0, 0))
+        else:
+            self.draw_background(self.screen, "forest", offset)
+            pygame.draw.rect(self.screen, BLACK, (0, GROUND_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_HEIGHT))
+        profiler.stop("background.draw", t)
+        queue = self.render_queue
+        t = profiler.start()
         for brain in self.brains:
-            brain.draw(self.screen)
+            brain.submit(queue)
+        profiler.stop("brains.draw", t)
+        t = profiler.start()
         for mushroom in self.mushrooms:
             if mushroom.death_animation <= 0 or mushroom.alpha > 0:
-                mushroom.draw(self.screen)
+                mushroom.submit(queue, blend)
+        profiler.stop("mushrooms.draw", t)
+        t = profiler.start()
         if self.character:
-            self.character.draw(self.screen)
-            self.character.draw_weapon(self.screen)
+            self.character.submit(queue, blend)
+            self.character.submit_weapon(queue, blend)
             weapon = self.character.get_current_weapon()
             if self.character.attack_cooldown > weapon["cooldown"] - 10:
-                attack_pos = self.character.x + self.character.direction * weapon["range"]
-                pygame.draw.circle(self.screen, WHITE, (attack_pos, self.character.y), 20)
-        self.left_arrow.draw(self.screen)
-        self.right_arrow.draw(self.screen)
-        score_text = font_medium.render(f"Очки: {self.score}", True, WHITE)
-        health_text = font_medium.render(f"Здоровье: {self.character.health if self.character else 0}", True, WHITE)
-        group_text = font_medium.render(f"Группа: {self.current_group}", True, WHITE)
-        self.screen.blit(score_text, (10, 10))
-        self.screen.blit(health_text, (10, 40))
-        self.screen.blit(group_text, (10, 70))
+                attack_pos = self.character.x + self.character.lerp_dx(blend) + self.character.direction * weapon["range"]
+                marker = self.attack_marker()
+                queue.submit(LAYER_EFFECTS, marker, marker.get_rect(center=(attack_pos, self.character.y)))
+        profiler.stop("character.draw", t)
+        t = profiler.start()
+        self.left_arrow.submit(queue)
+        self.right_arrow.submit(queue)
+        score_text = self.hud_text("score", fonts.medium, "Очки: {}", self.score)
+        health_text = self.hud_text("health", fonts.medium, "Здоровье: {}", self.character.health if self.character else 0)
+        group_text = self.hud_text("group", fonts.medium, "Группа: {}", self.current_group)
+        queue.submit(LAYER_HUD, score_text, score_text.get_rect(topleft=(10, 10)))
+        queue.submit(LAYER_HUD, health_text, health_text.get_rect(topleft=(10, 40)))
+        queue.submit(LAYER_HUD, group_text, group_text.get_rect(topleft=(10, 70)))
         if self.character:
             weapon = self.character.get_current_weapon()
-            weapon_text = font_small.render(f"{weapon['name']} (Урон: {weapon['damage']}, Дальность: {weapon['range']})", True, WHITE)
-            self.screen.blit(weapon_text, (SCREEN_WIDTH//2 - weapon_text.get_width()//2, 10))
-            controls_text = font_small.render("1-4: смена оружия, SPACE: атака, ESC: пауза", True, WHITE)
-            self.screen.blit(controls_text, (SCREEN_WIDTH//2 - controls_text.get_width()//2, SCREEN_HEIGHT - 30))
+            weapon_text = self.hud_text("weapon", fonts.small, "{} (Урон: {}, Дальность: {})", weapon['name'], weapon['damage'], weapon['range'])
+            queue.submit(LAYER_HUD, weapon_text, weapon_text.get_rect(midtop=(SCREEN_WIDTH//2, 10)))
+            controls_text = texts.render(fonts.small, "1-4: смена оружия, SPACE: атака, ESC: пауза")
+            queue.submit(LAYER_HUD, controls_text, controls_text.get_rect(midtop=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 30)))
+        profiler.stop("hud.draw", t)
+        # Сами blit идут пачкой в flush, так что *.draw - время сбора очереди по классам объектов
+        t = profiler.start()
+        drawn = queue.flush(self.screen)
+        profiler.stop("flush", t)
+        self.render_counts = queue.reset_counts()
+        if self.dirty_rects:
+            # Обновляем и старые позиции (уже стертые), и новые
+            self.update_rects = self.dirty_prev + drawn if partial else None
+            self.dirty_prev = drawn
+
+    def attack_marker(self) -> pygame.Surface:
+        if self.attack_marker_surface is None:
+            marker = pygame.Surface((41, 41)).convert()
+            marker.fill(BLACK)
+            marker.set_colorkey(BLACK)
+            pygame.draw.circle(marker, WHITE, (20, 20), 20)
+            self.attack_marker_surface = marker
+        return self.attack_marker_surface
+
+    def draw_profiler_overlay(self):
+        width, height, graph_height = 300, 195, 60
+        if self.profiler_panel is None:
+            self.profiler_panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel = self.profiler_panel
+        panel.fill((0, 0, 0, 170))
+        # Столбики времени кадра: полная высота графика - два бюджета по 16.6 мс
+        budget = 1000 / FPS
+        frames = profiler.samples("frame", width - 20)
+        for i, value in enumerate(frames):
+            bar = min(graph_height, int(value / (2 * budget) * graph_height))
+            color = RED if value > budget else GREEN
+            pygame.draw.line(panel, color, (10 + i, 10 + graph_height), (10 + i, 10 + graph_height - bar))
+        pygame.draw.line(panel, YELLOW, (10, 10 + graph_height // 2), (width - 10, 10 + graph_height // 2))
+        # Подписи пересобираем раз в полсекунды, чтобы их можно было прочитать
+        if profiler.frames % 30 == 0 or not self.profiler_lines:
+            lines = []
+            if frames:
+                lines.append(f"кадр: {sum(frames) / len(frames):.2f} мс, макс {max(frames):.2f} мс")
+            for name, worst, mean in profiler.worst(4):
+                lines.append(f"{name}: {mean:.2f} / {worst:.2f} мс")
+            submitted, culled = self.render_counts
+            lines.append(f"отрисовка: {submitted - culled} из {submitted}, отсечено {culled}")
+            self.profiler_lines = [texts.render(fonts.small, line) for line in lines]
+        for i, line in enumerate(self.profiler_lines):
+            panel.blit(line, (10, 20 + graph_height + i * 18))
+        self.screen.blit(panel, (SCREEN_WIDTH - width - 10, 100))
+
+    def export_profile(self, path: str):
+        profiler.export_csv(path + ".csv")
+        profiler.export_json(path + ".json")
+
+    def refresh_static_layer(self, offset: int):
+        if self.static_layer is None:
+            self.static_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        self.draw_background(self.static_layer, "forest", offset)
+        pygame.draw.rect(self.static_layer, BLACK, (0, GROUND_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_HEIGHT))
+        self.static_offset = offset
+
+    def present(self):
+        if self.update_rects is not None:
+            pygame.display.update(self.update_rects)
+        else:
+            pygame.display.flip()
+        if self.game_state not in ["playing", "moving_forward"]:
+            self.dirty_prev = None
+        self.update_rects = None
+
+    def hud_text(self, slot: str, font: pygame.font.Font, template: str, *values) -> pygame.Surface:
+        cached = self.hud_cache.get(slot)
+        if cached is None or cached[0] != values:
+            cached = (values, texts.render(font, template.format(*values)))
+            self.hud_cache[slot] = cached
+        return cached[1]
 
     def draw_game_over(self):
-        self.screen.blit(self.background, (-self.background_offset, 0))
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        self.screen.blit(overlay, (0, 0))
         message = "Игра окончена!" if self.character and self.character.health <= 0 else "Победа!"
-        message_text = font_large.render(message, True, WHITE)
-        score_text = font_medium.render(f"Ваш счет: {self.score}", True, WHITE)
-        restart_text = font_medium.render("Нажмите ENTER для рестарта", True, WHITE)
-        leaderboard_text = font_medium.render("Нажмите L для таблицы лидеров", True, WHITE)
-        self.screen.blit(message_text, (SCREEN_WIDTH//2 - message_text.get_width()//2, SCREEN_HEIGHT//2 - 60))
-        self.screen.blit(score_text, (SCREEN_WIDTH//2 - score_text.get_width()//2, SCREEN_HEIGHT//2))
-        self.screen.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, SCREEN_HEIGHT//2 + 60))
-        self.screen.blit(leaderboard_text, (SCREEN_WIDTH//2 - leaderboard_text.get_width()//2, SCREEN_HEIGHT//2 + 100))
+        self.draw_static("game_over", (message, self.score, self.background_offset),
+                         lambda surface: self.compose_game_over(surface, message))
+
+    def compose_game_over(self, surface: pygame.Surface, message: str):
+        self.draw_background(surface, "forest", self.background_offset)
+        if self.game_over_overlay is None:
+            self.game_over_overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+            self.game_over_overlay.fill((0, 0, 0, 180))
+        surface.blit(self.game_over_overlay, (0, 0))
+        message_text = texts.render(fonts.large, message)
+        score_text = texts.render(fonts.medium, f"Ваш счет: {self.score}")
+        restart_text = texts.render(fonts.medium, "Нажмите ENTER для рестарта")
+        leaderboard_text = texts.render(fonts.medium, "Нажмите L для таблицы лидеров")
+        surface.blit(message_text, (SCREEN_WIDTH//2 - message_text.get_width()//2, SCREEN_HEIGHT//2 - 60))
+        surface.blit(score_text, (SCREEN_WIDTH//2 - score_text.get_width()//2, SCREEN_HEIGHT//2))
+        surface.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, SCREEN_HEIGHT//2 + 60))
+        surface.blit(leaderboard_text, (SCREEN_WIDTH//2 - leaderboard_text.get_width()//2, SCREEN_HEIGHT//2 + 100))
 
     def draw_leaderboard(self):
-        self.screen.blit(self.leaderboard_bg, (0, 0))
-        title_text = font_large.render("Таблица лидеров", True, WHITE)
-        self.screen.blit(title_text, (SCREEN_WIDTH//2 - title_text.get_width()//2, 50))
+        self.draw_static("leaderboard", (self.leaderboard_version,), self.compose_leaderboard)
+
+    def compose_leaderboard(self, surface: pygame.Surface):
+        self.draw_background(surface, "leaderboard")
+        title_text = texts.render(fonts.large, "Таблица лидеров")
+        surface.blit(title_text, (SCREEN_WIDTH//2 - title_text.get_width()//2, 50))
         if not self.leaderboard:
-            no_data_text = font_medium.render("Нет данных", True, WHITE)
-            self.screen.blit(no_data_text, (SCREEN_WIDTH//2 - no_data_text.get_width()//2, 120))
+            no_data_text = texts.render(fonts.medium, "Нет данных")
+            surface.blit(no_data_text, (SCREEN_WIDTH//2 - no_data_text.get_width()//2, 120))
         else:
             for i, entry in enumerate(self.leaderboard[:10]):
                 name = entry.get('name', 'Unknown')
                 score = entry.get('score', 0)
                 character = entry.get('character', '???')
-                entry_text = font_medium.render(f"{i+1}. {name} ({character}): {score}", True, WHITE)
-                self.screen.blit(entry_text, (SCREEN_WIDTH//2 - entry_text.get_width()//2, 120 + i * 40))
-        back_text = font_medium.render("Нажмите ESC для возврата", True, WHITE)
-        self.screen.blit(back_text, (SCREEN_WIDTH//2 - back_text.get_width()//2, SCREEN_HEIGHT - 50))
\ No newline at end of file
+                entry_text = texts.render(fonts.medium, f"{i+1}. {name} ({character}): {score}")
+                surface.blit(entry_text, (SCREEN_WIDTH//2 - entry_text.get_width()//2, 120 + i * 40))
+        back_text = texts.render(fonts.medium, "Нажмите ESC для возврата")
+        surface.blit(back_text, (SCREEN_WIDTH//2 - back_text.get_width()//2, SCREEN_HEIGHT - 50))
\ No newline at end of file
@@ -3,37 +3,79 @@ import os
 import random
 from typing import List, Dict, Tuple, Optional
 from constants import *
+from assets import assets, SpriteAtlas, AtlasKey, OPAQUE_ALPHAS, BLINK_ALPHAS, FADE_ALPHAS
+from render_queue import RenderQueue, LAYER_PICKUPS, LAYER_ENEMIES, LAYER_CHARACTER, LAYER_WEAPON, LAYER_UI
+
+WEAPONS = [
+    {"name": "Шариковая ручка", "damage": 1, "range": 60, "cooldown": 20, "image": "pen"},
+    {"name": "Канцелярский нож", "damage": 2, "range": 70, "cooldown": 30, "image": "knife"},
+    {"name": "Метла", "damage": 3, "range": 80, "cooldown": 40, "image": "broom"},
+    {"name": "Меч", "damage": 4, "range": 90, "cooldown": 50, "image": "sword"}
+]
+
+# Скачки дальше этого (телепорт персонажа после прокрутки) не сглаживаем
+LERP_LIMIT = 50
+
 
 class GameObject:
-    def __init__(self, x: int, y: int, width: int, height: int, image_path: str):
+    __slots__ = ("x", "y", "width", "height", "image_key", "_atlas", "rect", "alpha", "prev_x")
+    layer = LAYER_PICKUPS
+
+    def __init__(self, x: int, y: int, width: int, height: int, image_path: str,
+                 alphas: Tuple[int, ...] = OPAQUE_ALPHAS, flip: bool = False, pressed: bool = False):
+        self.image_key = None
+        self._atlas = None
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.place(x, y, width, height, image_path, alphas, flip, pressed)
+
+    def place(self, x: int, y: int, width: int, height: int, image_path: str,
+              alphas: Tuple[int, ...] = OPAQUE_ALPHAS, flip: bool = False, pressed: bool = False):
         self.x = x
+        self.prev_x = x
         self.y = y
         self.width = width
         self.height = height
-        self.image = self.load_image(image_path, width, height)
-        self.rect = self.image.get_rect(center=(x, y))
+        # Изображение загружается при первой отрисовке, симуляции без экрана оно не нужно
+        image_key = (image_path, (width, height), flip, pressed, alphas)
+        if image_key != self.image_key:
+            self.image_key = image_key
+            self._atlas = None
+        self.rect.size = (width, height)
+        self.rect.center = (x, y)
         self.alpha = 255
 
+    @property
+    def atlas(self) -> SpriteAtlas:
+        if self._atlas is None:
+            self._atlas = assets.atlas(*self.image_key)
+        return self._atlas
+
+    @property
+    def image(self) -> pygame.Surface:
+        return self.atlas.base
+
     def load_image(self, path: str, width: int, height: int) -> pygame.Surface:
-        try:
-            image = pygame.image.load(path)
-            return pygame.transform.scale(image, (width, height)).convert_alpha()
-        except (pygame.error, FileNotFoundError):
-            surf = pygame.Surface((width, height), pygame.SRCALPHA)
-            surf.fill(RED)
-            return surf
+        return assets.image(path, (width, height))
 
-    def draw(self, screen: pygame.Surface):
-        if self.alpha != 255:
-            self.image.set_alpha(self.alpha)
-        screen.blit(self.image, self.rect)
+    def lerp_dx(self, blend: float) -> int:
+        # Сдвиг от позиции текущего такта к промежуточной между prev_x и x
+        dx = self.x - self.prev_x
+        if blend >= 1 or abs(dx) > LERP_LIMIT:
+            return 0
+        return round(dx * (blend - 1))
+
+    def submit(self, queue: RenderQueue, blend: float = 1.0):
+        dx = self.lerp_dx(blend)
+        queue.submit(self.layer, self.atlas.get(alpha=self.alpha), self.rect.move(dx, 0) if dx else self.rect)
 
 
 class Character(GameObject):
+    layer = LAYER_CHARACTER
+
     def __init__(self, x: int, y: int, char_type: str):
         self.char_type = char_type
-        image_path = os.path.join(CHARACTERS_DIR, f"{char_type}.png") if os.path.exists(os.path.join(CHARACTERS_DIR, f"{char_type}.png")) else ""
-        super().__init__(x, y, CHARACTER_WIDTH, CHARACTER_HEIGHT, image_path)
+        image_path = assets.asset_path(CHARACTERS_DIR, f"{char_type}.png")
+        super().__init__(x, y, CHARACTER_WIDTH, CHARACTER_HEIGHT, image_path, BLINK_ALPHAS)
         self.speed = 5
         self.max_health = 5
         self.health = self.max_health
@@ -44,30 +86,38 @@ class Character(GameObject):
         self.invincible_timer = 0
         self.blink_timer = 0
 
+    @staticmethod
+    def image_keys(char_type: str) -> List[AtlasKey]:
+        keys = [(assets.asset_path(CHARACTERS_DIR, f"{char_type}.png"), (CHARACTER_WIDTH, CHARACTER_HEIGHT), False, False, BLINK_ALPHAS)]
+        for weapon in WEAPONS:
+            keys.append((os.path.join(WEAPONS_DIR, f"{weapon['image']}.png"), (WEAPON_WIDTH, WEAPON_HEIGHT), True, False, OPAQUE_ALPHAS))
+        return keys
+
     def load_weapons(self) -> List[Dict]:
-        weapons = [
-            {"name": "Шариковая ручка", "damage": 1, "range": 60, "cooldown": 20, "image": "pen"},
-            {"name": "Канцелярский нож", "damage": 2, "range": 70, "cooldown": 30, "image": "knife"},
-            {"name": "Метла", "damage": 3, "range": 80, "cooldown": 40, "image": "broom"},
-            {"name": "Меч", "damage": 4, "range": 90, "cooldown": 50, "image": "sword"}
-        ]
+        weapons = [dict(weapon) for weapon in WEAPONS]
         for weapon in weapons:
             image_path = os.path.join(WEAPONS_DIR, f"{weapon['image']}.png")
-            weapon["image_surface"] = self.load_image(image_path, WEAPON_WIDTH, WEAPON_HEIGHT)
+            weapon["image_path"] = image_path
         return weapons
 
+    def get_weapon_atlas(self, weapon: Dict) -> SpriteAtlas:
+        atlas = weapon.get("atlas")
+        if atlas is None:
+            atlas = assets.atlas(weapon["image_path"], (WEAPON_WIDTH, WEAPON_HEIGHT), flip=True)
+            weapon["atlas"] = atlas
+        return atlas
+
     def get_current_weapon(self) -> Dict:
         return self.weapons[self.current_weapon]
 
     def switch_weapon(self, direction: int):
         self.current_weapon = (self.current_weapon + direction) % len(self.weapons)
 
-    def update(self):
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:
+    def update(self, left: bool, right: bool):
+        if left:
             self.x -= self.speed
             self.direction = -1
-        elif keys[pygame.K_RIGHT]:
+        elif right:
             self.x += self.speed
             self.direction = 1
         self.x = max(0, min(self.x, SCREEN_WIDTH))
@@ -82,7 +132,6 @@ class Character(GameObject):
                 self.alpha = 128 if self.alpha == 255 else 255
         else:
             self.alpha = 255
-            self.image.set_alpha(255)
 
     def take_damage(self, amount: int = 1) -> bool:
         if self.invincible_timer <= 0:
@@ -99,30 +148,39 @@ class Character(GameObject):
             return weapon
         return None
 
-    def draw_weapon(self, screen: pygame.Surface):
+    def submit_weapon(self, queue: RenderQueue, blend: float = 1.0):
         weapon = self.get_current_weapon()
-        weapon_x = self.x + self.direction * 40
+        weapon_x = self.x + self.lerp_dx(blend) + self.direction * 40
         weapon_y = self.y - 20
-        img = pygame.transform.flip(weapon["image_surface"], self.direction == -1, False)
-        screen.blit(img, (weapon_x - WEAPON_WIDTH//2, weapon_y - WEAPON_HEIGHT//2))
+        img = self.get_weapon_atlas(weapon).get(flipped=self.direction == -1)
+        queue.submit(LAYER_WEAPON, img, pygame.Rect(weapon_x - WEAPON_WIDTH//2, weapon_y - WEAPON_HEIGHT//2, WEAPON_WIDTH, WEAPON_HEIGHT))
 
 
 class Mushroom(GameObject):
-    def __init__(self, x: int, y: int, is_big: bool = False):
+    __slots__ = ("is_big", "rng", "health", "points", "brain_chance", "speed", "attack_cooldown",
+                 "state", "state_timer", "death_animation", "slot")
+    layer = LAYER_ENEMIES
+
+    def __init__(self, x: int, y: int, is_big: bool = False, rng: random.Random = random,
+                 skin_rng: random.Random = random):
+        super().__init__(x, y, MUSHROOM_WIDTH, MUSHROOM_HEIGHT, "", FADE_ALPHAS)
+        self.slot = -1
+        self.reset(x, y, is_big, rng, skin_rng)
+
+    def reset(self, x: int, y: int, is_big: bool = False, rng: random.Random = random,
+              skin_rng: random.Random = random):
         self.is_big = is_big
+        self.rng = rng
+        # Картинку выбирает отдельный генератор: набор файлов на машине не должен влиять на ход игры
+        image_paths = self.image_paths(is_big)
+        image_path = skin_rng.choice(image_paths) if image_paths else ""
         if is_big:
-            image_files = [f for f in os.listdir(MUSHROOMS_DIR) if f.startswith("big_") and f.endswith(('.png', '.jpg', '.jpeg'))]
-            image_file = random.choice(image_files) if image_files else ""
-            image_path = os.path.join(MUSHROOMS_DIR, image_file) if image_file else ""
-            super().__init__(x, y, BIG_MUSHROOM_WIDTH, BIG_MUSHROOM_HEIGHT, image_path)
+            self.place(x, y, BIG_MUSHROOM_WIDTH, BIG_MUSHROOM_HEIGHT, image_path, FADE_ALPHAS)
             self.health = 4
             self.points = 10
             self.brain_chance = 0.3
         else:
-            image_files = [f for f in os.listdir(MUSHROOMS_DIR) if f.startswith("small_") and f.endswith(('.png', '.jpg', '.jpeg'))]
-            image_file = random.choice(image_files[:5]) if len(image_files) >= 5 else ""
-            image_path = os.path.join(MUSHROOMS_DIR, image_file) if image_file else ""
-            super().__init__(x, y, MUSHROOM_WIDTH, MUSHROOM_HEIGHT, image_path)
+            self.place(x, y, MUSHROOM_WIDTH, MUSHROOM_HEIGHT, image_path, FADE_ALPHAS)
             self.health = 2
             self.points = 5
             self.brain_chance = 0
@@ -132,6 +190,23 @@ class Mushroom(GameObject):
         self.state_timer = 0
         self.death_animation = 0
 
+    @staticmethod
+    def image_paths(is_big: bool) -> List[str]:
+        if is_big:
+            image_files = assets.listdir(MUSHROOMS_DIR, "big_")
+        else:
+            image_files = assets.listdir(MUSHROOMS_DIR, "small_")
+            image_files = image_files[:5] if len(image_files) >= 5 else []
+        return [os.path.join(MUSHROOMS_DIR, f) for f in image_files]
+
+    @staticmethod
+    def image_keys() -> List[AtlasKey]:
+        keys = []
+        for is_big, size in ((True, (BIG_MUSHROOM_WIDTH, BIG_MUSHROOM_HEIGHT)), (False, (MUSHROOM_WIDTH, MUSHROOM_HEIGHT))):
+            # Пустой путь - запасное изображение, если файлов нет
+            keys += [(path, size, False, False, FADE_ALPHAS) for path in Mushroom.image_paths(is_big) or [""]]
+        return keys
+
     def update(self, target_x: int):
         if self.death_animation > 0:
             self.death_animation -= 1
@@ -140,11 +215,11 @@ class Mushroom(GameObject):
         if self.state == "idle":
             self.state_timer -= 1
             if self.state_timer <= 0:
-                if random.random() < 0.3:
+                if self.rng.random() < 0.3:
                     self.state = "moving"
-                    self.state_timer = random.randint(30, 90)
+                    self.state_timer = self.rng.randint(30, 90)
                 else:
-                    self.state_timer = random.randint(30, 60)
+                    self.state_timer = self.rng.randint(30, 60)
         elif self.state == "moving":
             if self.x < target_x:
                 self.x += self.speed
@@ -158,7 +233,7 @@ class Mushroom(GameObject):
             self.state_timer -= 1
             if self.state_timer <= 0:
                 self.state = "idle"
-                self.state_timer = random.randint(60, 120)
+                self.state_timer = self.rng.randint(60, 120)
         self.y = GROUND_HEIGHT - self.height // 2
         self.rect.center = (self.x, self.y)
 
@@ -166,7 +241,7 @@ class Mushroom(GameObject):
         self.health -= damage
         if self.health <= 0:
             self.death_animation = 20
-            brain_drop = self.is_big and random.random() < self.brain_chance
+            brain_drop = self.is_big and self.rng.random() < self.brain_chance
             return (True, brain_drop)
         return (False, False)
 
@@ -178,10 +253,21 @@ class Mushroom(GameObject):
 
 
 class Brain(GameObject):
+    __slots__ = ("lifetime", "slot")
+
     def __init__(self, x: int, y: int):
-        image_path = os.path.join(EFFECTS_DIR, "brain.png") if os.path.exists(os.path.join(EFFECTS_DIR, "brain.png")) else ""
+        image_path = assets.asset_path(EFFECTS_DIR, "brain.png")
         super().__init__(x, y, BRAIN_WIDTH, BRAIN_HEIGHT, image_path)
         self.lifetime = 180
+        self.slot = -1
+
+    def reset(self, x: int, y: int):
+        self.place(x, y, BRAIN_WIDTH, BRAIN_HEIGHT, self.image_key[0])
+        self.lifetime = 180
+
+    @staticmethod
+    def image_keys() -> List[AtlasKey]:
+        return [(assets.asset_path(EFFECTS_DIR, "brain.png"), (BRAIN_WIDTH, BRAIN_HEIGHT), False, False, OPAQUE_ALPHAS)]
 
     def update(self):
         self.lifetime -= 1
@@ -189,18 +275,18 @@ class Brain(GameObject):
 
 
 class ArrowButton(GameObject):
+    layer = LAYER_UI
+
     def __init__(self, x: int, y: int, direction: str):
-        image_path = os.path.join(UI_DIR, "arrow.png") if os.path.exists(os.path.join(UI_DIR, "arrow.png")) else ""
-        super().__init__(x, y, ARROW_WIDTH, ARROW_HEIGHT, image_path)
+        image_path = assets.asset_path(UI_DIR, "arrow.png")
+        super().__init__(x, y, ARROW_WIDTH, ARROW_HEIGHT, image_path, flip=True, pressed=True)
         self.direction = direction
         self.is_pressed = False
-        self.original_image = self.image.copy()
 
-    def draw(self, screen: pygame.Surface):
-        if self.direction == "left":
-            img = pygame.transform.flip(self.original_image, True, False)
-        else:
-            img = self.original_image.copy()
-        if self.is_pressed:
-            img.fill((255, 255, 255, 128), None, pygame.BLEND_RGBA_MULT)
-        screen.blit(img, self.rect)
\ No newline at end of file
+    @staticmethod
+    def image_keys() -> List[AtlasKey]:
+        return [(assets.asset_path(UI_DIR, "arrow.png"), (ARROW_WIDTH, ARROW_HEIGHT), True, True, OPAQUE_ALPHAS)]
+
+    def submit(self, queue: RenderQueue, blend: float = 1.0):
+        img = self.atlas.get(flipped=self.direction == "left", pressed=self.is_pressed)
+        queue.submit(self.layer, img, self.rect)
\ No newline at end of file
@@ -0,0 +1,131 @@
+import bisect
+import time
+from typing import Dict, List, Tuple
+
+# Верхние границы корзин гистограммы, мс; последняя корзина - все, что дольше
+LATENCY_BUCKETS_MS = [1, 2, 4, 8, 12, 16, 20, 25, 33, 50, 67, 100, 200]
+# Последние миллисекунды перед сроком ждем активно: sleep просыпается с опозданием
+SPIN_SECONDS = 0.002
+WAKE_MARGIN = 0.001
+
+
+def wait_until(deadline: float):
+    remaining = deadline - time.perf_counter()
+    if remaining > SPIN_SECONDS:
+        time.sleep(remaining - SPIN_SECONDS)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class LatencyTracker:
+    def __init__(self):
+        self.last_poll = time.perf_counter()
+        self.pending: Dict[str, float] = {}
+        self.applied: List[Tuple[str, float]] = []
+        self.histograms: Dict[str, List[int]] = {}
+        self.totals: Dict[str, List[float]] = {}
+
+    def poll(self) -> float:
+        # pygame не отдает время события SDL: считаем, что нажатие пришло в середине
+        # промежутка между двумя опросами очереди
+        now = time.perf_counter()
+        arrival = (self.last_poll + now) / 2
+        self.last_poll = now
+        return arrival
+
+    def input(self, kind: str, timestamp: float):
+        self.pending.setdefault(kind, timestamp)
+
+    def apply(self, kind: str):
+        # Ввод повлиял на состояние, которое уйдет на экран ближайшим кадром
+        timestamp = self.pending.pop(kind, None)
+        if timestamp is not None:
+            self.applied.append((kind, timestamp))
+
+    def discard(self, kind: str):
+        # Клавишу отпустили раньше ближайшего такта: на экран нажатие так и не попало
+        self.pending.pop(kind, None)
+
+    def presented(self):
+        if not self.applied:
+            return
+        now = time.perf_counter()
+        for kind, timestamp in self.applied:
+            self.record(kind, (now - timestamp) * 1000)
+        self.applied.clear()
+
+    def record(self, kind: str, ms: float):
+        histogram = self.histograms.get(kind)
+        if histogram is None:
+            histogram = self.histograms[kind] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            self.totals[kind] = [0, 0.0, 0.0]
+        histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        totals = self.totals[kind]
+        totals[0] += 1
+        totals[1] += ms
+        totals[2] = max(totals[2], ms)
+
+    def percentile(self, kind: str, q: float) -> float:
+        # Оценка сверху: граница корзины, в которую попадает q-й процентиль
+        histogram = self.histograms[kind]
+        target = q / 100 * sum(histogram)
+        seen = 0
+        for i, count in enumerate(histogram):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.totals[kind][2]
+        return 0.0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            kind: {
+                "count": count,
+                "mean_ms": total / count,
+                "p50_ms": self.percentile(kind, 50),
+                "p95_ms": self.percentile(kind, 95),
+                "max_ms": worst,
+            }
+            for kind, (count, total, worst) in self.totals.items()
+        }
+
+    def report(self) -> List[str]:
+        lines = []
+        for kind, stats in sorted(self.summary().items()):
+            lines.append(f"{kind:<8} {stats['count']:>6} нажатий, среднее {stats['mean_ms']:.1f} мс, "
+                         f"p50 <= {stats['p50_ms']:.0f} мс, p95 <= {stats['p95_ms']:.0f} мс, макс {stats['max_ms']:.1f} мс")
+        return lines
+
+
+class FramePacer:
+    # Кадр планируется от срока показа: просыпаемся с запасом на обработку кадра,
+    # читаем ввод как можно позже и показываем кадр точно в срок
+    def __init__(self, vsync: bool = False):
+        self.vsync = vsync
+        self.deadline = time.perf_counter()
+        self.work_estimate = 0.004
+        self.work_started = 0.0
+        self.refresh_period = 0.0
+        self.last_present = 0.0
+
+    def wake(self):
+        wait_until(self.deadline - self.work_estimate - WAKE_MARGIN)
+        self.work_started = time.perf_counter()
+
+    def hold(self):
+        work = time.perf_counter() - self.work_started
+        # Сглаженная оценка: одиночный долгий кадр не сдвигает пробуждение надолго
+        self.work_estimate = self.work_estimate * 0.9 + work * 0.1
+        if not self.vsync:
+            wait_until(self.deadline)
+
+    def presented(self, period: float):
+        now = time.perf_counter()
+        if self.vsync:
+            # flip() возвращается по кадровому гасящему импульсу: период развертки меряем сами
+            if self.last_present:
+                interval = now - self.last_present
+                self.refresh_period = interval if not self.refresh_period else self.refresh_period * 0.9 + interval * 0.1
+            self.last_present = now
+            self.deadline = now + max(period, self.refresh_period)
+        else:
+            self.deadline = max(self.deadline + period, now)
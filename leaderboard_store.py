@@ -0,0 +1,147 @@
+import bisect
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    character TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_score ON runs (score DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_character_score ON runs (character, score DESC);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class LeaderboardStore:
+    def __init__(self, path: str = "leaderboard.db", json_path: str = "leaderboard.json",
+                 top_size: int = 10, batch_size: int = 64):
+        self.path = path
+        self.top_size = top_size
+        self.batch_size = batch_size
+        self.written = 0
+        self.batches = 0
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        self._import_json(json_path)
+        # Топ держим в памяти, чтобы экран лидеров не ждал фоновую запись
+        self._top = self._query_top(top_size)
+        self._top_keys = [-entry["score"] for entry in self._top]
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="leaderboard-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _import_json(self, json_path: str):
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return
+        entries = []
+        if os.path.exists(json_path):
+            try:
+                with open(json_path, 'r') as f:
+                    data = json.load(f)
+                if isinstance(data, list):
+                    entries = data
+            except (json.JSONDecodeError, IOError):
+                print("Ошибка чтения таблицы лидеров, создаем новую")
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO runs (name, score, character, created) VALUES (?, ?, ?, ?)",
+                [(e.get("name", "Unknown"), int(e.get("score", 0)), e.get("character", "???"), now)
+                 for e in entries if isinstance(e, dict)])
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (str(len(entries)),))
+
+    def _rows_to_entries(self, rows) -> List[Dict]:
+        return [{"name": name, "score": score, "character": character} for name, score, character in rows]
+
+    def _query_top(self, k: int) -> List[Dict]:
+        rows = self._conn.execute(
+            "SELECT name, score, character FROM runs ORDER BY score DESC, id LIMIT ?", (k,)).fetchall()
+        return self._rows_to_entries(rows)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            batch = []
+            stop = item is None
+            if not stop:
+                batch.append(item)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany("INSERT INTO runs (name, score, character, created) VALUES (?, ?, ?, ?)", batch)
+                    self.written += len(batch)
+                    self.batches += 1
+                except sqlite3.Error:
+                    print("Ошибка сохранения таблицы лидеров")
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                break
+        conn.close()
+
+    def add(self, name: str, score: int, character: str):
+        entry = {"name": name, "score": score, "character": character}
+        i = bisect.bisect_right(self._top_keys, -score)
+        if i < self.top_size:
+            self._top_keys.insert(i, -score)
+            self._top.insert(i, entry)
+            del self._top_keys[self.top_size:]
+            del self._top[self.top_size:]
+        self._queue.put((name, score, character, time.time()))
+
+    def top(self, k: Optional[int] = None) -> List[Dict]:
+        if k is None or k <= self.top_size:
+            return self._top[:k]
+        self.flush()
+        return self._query_top(k)
+
+    def top_by_character(self, character: str, k: int = 10) -> List[Dict]:
+        self.flush()
+        rows = self._conn.execute(
+            "SELECT name, score, character FROM runs WHERE character = ? ORDER BY score DESC, id LIMIT ?",
+            (character, k)).fetchall()
+        return self._rows_to_entries(rows)
+
+    def has_entry(self, name: str, score: int, character: str) -> bool:
+        self.flush()
+        row = self._conn.execute(
+            "SELECT 1 FROM runs WHERE name = ? AND score = ? AND character = ? LIMIT 1", (name, score, character)).fetchone()
+        return row is not None
+
+    def count(self) -> int:
+        self.flush()
+        return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._conn.close()
@@ -1,5 +1,34 @@
+import argparse
 from game import Game
+from replay import Replay
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Грибное приключение")
+    parser.add_argument("--dirty-rects", action="store_true", help="перерисовывать только изменившиеся области экрана")
+    parser.add_argument("--profile", action="store_true", help="включить профилировщик кадра с запуска (F3 - оверлей)")
+    parser.add_argument("--profile-export", default="", metavar="PATH", help="при выходе сохранить замеры в PATH.csv и PATH.json")
+    parser.add_argument("--level-length", type=int, default=2400, metavar="PX", help="длина уровня в пикселях, 0 - бесконечный уровень")
+    parser.add_argument("--no-record", action="store_true", help="не записывать забеги в папку replays")
+    parser.add_argument("--replay", metavar="FILE", help="воспроизвести записанный забег в окне и сверить счет")
+    parser.add_argument("--render-mode", choices=["throttled", "vsync", "uncapped"], default="throttled",
+                        help="частота отрисовки; скорость игры от нее не зависит")
+    parser.add_argument("--render-fps", type=int, default=60, help="предел кадров в секунду для throttled")
+    parser.add_argument("--spectate-port", type=int, default=0, metavar="PORT",
+                        help="транслировать игру зрителям (spectator.py) на 127.0.0.1:PORT")
+    parser.add_argument("--low-latency", action="store_true",
+                        help="фильтровать очередь событий, читать ввод перед самым показом кадра и точно выдерживать темп")
+    parser.add_argument("--checkpoint", default="checkpoint.sav", metavar="FILE", help="файл сохранения незаконченного забега")
+    parser.add_argument("--checkpoint-every", type=float, default=10, metavar="SEC",
+                        help="сохранять забег раз в SEC секунд игры и при выходе, 0 - не сохранять")
+    parser.add_argument("--resume", action="store_true", help="продолжить забег из файла сохранения")
+    parser.add_argument("--trace-alloc", action="store_true",
+                        help="считать выделения памяти по фазам кадра и строкам (tracemalloc), отчет при выходе")
+    args = parser.parse_args()
+    game = Game(dirty_rects=args.dirty_rects, profile=args.profile or bool(args.profile_export), profile_export=args.profile_export,
+                level_length=args.level_length, record=not args.no_record,
+                replay=Replay.load(args.replay) if args.replay else None,
+                render_mode=args.render_mode, render_fps=args.render_fps, spectate_port=args.spectate_port,
+                low_latency=args.low_latency, checkpoint_path=args.checkpoint,
+                checkpoint_seconds=args.checkpoint_every, resume=args.resume,
+                trace_alloc=args.trace_alloc)
+    game.run()
@@ -0,0 +1,285 @@
+from typing import Iterator, List, Optional, Tuple
+import pygame
+from constants import *
+from assets import assets, FADE_ALPHAS
+from game_objects import Mushroom, LERP_LIMIT
+from render_queue import RenderQueue, LAYER_ENEMIES
+from simulation import Simulation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+IDLE, MOVING, ATTACKING = 0, 1, 2
+STATE_NAMES = ["idle", "moving", "attacking"]
+FIELDS = ("x", "prev_x", "state", "timer", "health", "alpha", "death", "is_big", "skin")
+
+
+class MushroomArrays:
+    def __init__(self, seed: Optional[int] = None):
+        if np is None:
+            raise RuntimeError("Для векторного движка грибов нужен numpy")
+        self.reseed(seed)
+        self.speed = 2
+        self.small_health = 2
+        self.big_health = 4
+        self.brain_chance = 0.3
+        self.x = np.zeros(0, np.int32)
+        self.prev_x = np.zeros(0, np.int32)
+        self.state = np.zeros(0, np.int8)
+        self.timer = np.zeros(0, np.int32)
+        self.health = np.zeros(0, np.int32)
+        self.alpha = np.zeros(0, np.int32)
+        self.death = np.zeros(0, np.int32)
+        self.is_big = np.zeros(0, bool)
+        self.skin = np.zeros(0, np.int32)
+
+    def reseed(self, seed: Optional[int]):
+        self.rng = np.random.default_rng(seed)
+        # Только для выбора картинок, как Simulation.skin_rng
+        self.skin_rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def spawn(self, xs, is_big):
+        n = len(xs)
+        is_big = np.asarray(is_big, bool)
+        xs = np.asarray(xs, np.int32)
+        self.x = np.concatenate([self.x, xs])
+        self.prev_x = np.concatenate([self.prev_x, xs])
+        self.state = np.concatenate([self.state, np.full(n, IDLE, np.int8)])
+        self.timer = np.concatenate([self.timer, self.rng.integers(30, 91, n, dtype=np.int32)])
+        self.health = np.concatenate([self.health, np.where(is_big, self.big_health, self.small_health).astype(np.int32)])
+        self.alpha = np.concatenate([self.alpha, np.full(n, 255, np.int32)])
+        self.death = np.concatenate([self.death, np.zeros(n, np.int32)])
+        self.is_big = np.concatenate([self.is_big, is_big])
+        # Номер картинки берется по модулю числа файлов при отрисовке: расход ГСЧ от файлов не зависит
+        self.skin = np.concatenate([self.skin, self.skin_rng.integers(0, 1 << 16, n, dtype=np.int32)])
+
+    def remove_dead(self):
+        dead = (self.death > 0) & (self.alpha <= 0)
+        if dead.any():
+            keep = ~dead
+            for name in FIELDS:
+                setattr(self, name, getattr(self, name)[keep])
+
+    def update(self, target_x: int):
+        # Маски считаются по состоянию на начало такта, как в Mushroom.update
+        dying = self.death > 0
+        alive = ~dying
+        idle = alive & (self.state == IDLE)
+        moving = alive & (self.state == MOVING)
+        attacking = alive & (self.state == ATTACKING)
+        n = len(self.x)
+
+        self.death[dying] -= 1
+        self.alpha[dying] = np.maximum(0, self.alpha[dying] - 15)
+
+        self.timer[alive] -= 1
+        roll = self.rng.random(n)
+        start_moving = idle & (self.timer <= 0) & (roll < 0.3)
+        keep_idle = idle & (self.timer <= 0) & ~start_moving
+        self.state[start_moving] = MOVING
+        self.timer[start_moving] = self.rng.integers(30, 91, int(start_moving.sum()), dtype=np.int32)
+        self.timer[keep_idle] = self.rng.integers(30, 61, int(keep_idle.sum()), dtype=np.int32)
+
+        self.x[moving] += self.speed * np.sign(target_x - self.x[moving]).astype(np.int32)
+        to_attack = moving & ((self.timer <= 0) | (np.abs(self.x - target_x) < 20))
+        self.state[to_attack] = ATTACKING
+        self.timer[to_attack] = 30
+
+        to_idle = attacking & (self.timer <= 0)
+        self.state[to_idle] = IDLE
+        self.timer[to_idle] = self.rng.integers(60, 121, int(to_idle.sum()), dtype=np.int32)
+
+    def attacking_near(self, x: int, distance: int) -> bool:
+        # Как Mushroom.is_attacking: растворяющийся гриб сохраняет состояние и продолжает бить
+        mask = (self.state == ATTACKING) & (self.timer > 25) & (np.abs(self.x - x) < distance)
+        return bool(mask.any())
+
+    def hit(self, pos: int, reach: int, damage: int) -> Tuple[int, np.ndarray]:
+        # Как и в Mushroom.take_damage, удар по растворяющемуся грибу снова дает очки
+        mask = np.abs(self.x - pos) < reach
+        self.health[mask] -= damage
+        destroyed = mask & (self.health <= 0)
+        self.death[destroyed] = 20
+        points = int(np.where(self.is_big[destroyed], 10, 5).sum())
+        drops = destroyed & self.is_big & (self.rng.random(len(self.x)) < self.brain_chance)
+        return points, self.x[drops]
+
+    def active_count(self) -> int:
+        return int(((self.health > 0) & (self.death <= 0)).sum())
+
+    def clear(self):
+        for name in FIELDS:
+            setattr(self, name, getattr(self, name)[:0])
+
+
+class MushroomView:
+    # Гриб стада с интерфейсом Mushroom для бота, отрисовки и статистики; читает массивы по номеру
+    __slots__ = ("herd", "i", "rect", "_skin", "_atlas")
+    layer = LAYER_ENEMIES
+
+    def __init__(self, herd: MushroomArrays, i: int):
+        self.herd = herd
+        self.i = i
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        # Атлас ищется заново, только когда на этом месте в массивах оказался гриб с другой картинкой
+        self._skin = None
+        self._atlas = None
+
+    @property
+    def x(self) -> int:
+        return int(self.herd.x[self.i])
+
+    @property
+    def prev_x(self) -> int:
+        return int(self.herd.prev_x[self.i])
+
+    @prev_x.setter
+    def prev_x(self, value: int):
+        # Единственное поле, которое пишут снаружи: начальная точка интерполяции
+        self.herd.prev_x[self.i] = value
+
+    @property
+    def is_big(self) -> bool:
+        return bool(self.herd.is_big[self.i])
+
+    @property
+    def width(self) -> int:
+        return BIG_MUSHROOM_WIDTH if self.is_big else MUSHROOM_WIDTH
+
+    @property
+    def height(self) -> int:
+        return BIG_MUSHROOM_HEIGHT if self.is_big else MUSHROOM_HEIGHT
+
+    @property
+    def y(self) -> int:
+        return GROUND_HEIGHT - self.height // 2
+
+    @property
+    def health(self) -> int:
+        return int(self.herd.health[self.i])
+
+    @property
+    def points(self) -> int:
+        return 10 if self.is_big else 5
+
+    @property
+    def state(self) -> str:
+        return STATE_NAMES[self.herd.state[self.i]]
+
+    @property
+    def state_timer(self) -> int:
+        return int(self.herd.timer[self.i])
+
+    @property
+    def alpha(self) -> int:
+        return int(self.herd.alpha[self.i])
+
+    @property
+    def death_animation(self) -> int:
+        return int(self.herd.death[self.i])
+
+    @property
+    def image_key(self) -> tuple:
+        paths = Mushroom.image_paths(self.is_big)
+        path = paths[self.herd.skin[self.i] % len(paths)] if paths else ""
+        return (path, (self.width, self.height), False, False, FADE_ALPHAS)
+
+    def is_attacking(self) -> bool:
+        return self.state == "attacking" and self.state_timer > 25
+
+    def is_dead(self) -> bool:
+        return self.death_animation > 0 and self.alpha <= 0
+
+    def submit(self, queue: RenderQueue, blend: float = 1.0):
+        herd = self.herd
+        i = self.i
+        x = int(herd.x[i])
+        dx = x - int(herd.prev_x[i])
+        if blend < 1 and abs(dx) <= LERP_LIMIT:
+            x += round(dx * (blend - 1))
+        skin = (bool(herd.is_big[i]), int(herd.skin[i]))
+        if skin != self._skin:
+            self._skin = skin
+            self._atlas = assets.atlas(*self.image_key)
+            self.rect.size = (self.width, self.height)
+        rect = self.rect
+        rect.center = (x, self.y)
+        queue.submit(self.layer, self._atlas.get(alpha=int(herd.alpha[i])), rect)
+
+
+class HerdView:
+    # Только чтение: список грибов для кода, который ждет sim.mushrooms; объекты-виды переиспользуются
+    def __init__(self, herd: MushroomArrays):
+        self.herd = herd
+        self._views: List[MushroomView] = []
+
+    def __len__(self) -> int:
+        return len(self.herd)
+
+    def __getitem__(self, i: int) -> MushroomView:
+        if not 0 <= i < len(self.herd):
+            raise IndexError(i)
+        while len(self._views) <= i:
+            self._views.append(MushroomView(self.herd, len(self._views)))
+        return self._views[i]
+
+    def __iter__(self) -> Iterator[MushroomView]:
+        for i in range(len(self.herd)):
+            yield self[i]
+
+
+class VectorSimulation(Simulation):
+    def __init__(self, seed: Optional[int] = None):
+        self.herd = MushroomArrays(seed)
+        super().__init__(seed)
+        self.mushrooms = HerdView(self.herd)
+
+    def reseed(self, seed: Optional[int]):
+        super().reseed(seed)
+        self.herd.reseed(seed)
+
+    def clear_mushrooms(self):
+        self.herd.clear()
+
+    def spawn_mushroom_group(self):
+        group_size = self.rng.randint(self.min_group_size, self.max_group_size)
+        start_x = self.background_offset + SCREEN_WIDTH + 100
+        has_big = self.rng.random() < 0.3
+        xs = start_x + np.arange(group_size) * 100
+        is_big = np.zeros(group_size, bool)
+        is_big[-1] = has_big
+        self.herd.spawn(xs, is_big)
+        self.group_defeated = False
+        self.current_group += 1
+
+    def resolve_attack(self):
+        attack_result = self.character.attack()
+        if attack_result:
+            attack_pos = self.character.x + self.character.direction * attack_result["range"]
+            points, drops = self.herd.hit(attack_pos, 30, attack_result["damage"])
+            self.score += points
+            for x in drops:
+                self.add_brain(int(x), GROUND_HEIGHT - BIG_MUSHROOM_HEIGHT // 2)
+
+    def update_mushrooms(self):
+        herd = self.herd
+        herd.remove_dead()
+        target_x = self.character.x if self.character else SCREEN_WIDTH//2
+        herd.update(target_x)
+        if self.character and herd.attacking_near(self.character.x, 50):
+            if self.character.take_damage():
+                if self.character.health <= 0:
+                    self.game_state = "game_over"
+                    self.on_game_over()
+        self.update_brains()
+        if herd.active_count() == 0 and len(herd) > 0:
+            herd.clear()
+            self.group_defeated = True
+            self.game_state = "moving_forward"
+        if self.group_defeated and len(herd) == 0:
+            self.spawn_mushroom_group()
@@ -0,0 +1,72 @@
+from typing import Dict, Iterator, List
+
+
+class ActiveList:
+    __slots__ = ("items",)
+
+    def __init__(self):
+        self.items: List = []
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.items)
+
+    def __getitem__(self, i: int):
+        return self.items[i]
+
+    def add(self, obj):
+        obj.slot = len(self.items)
+        self.items.append(obj)
+
+    def remove(self, obj):
+        # Последний элемент переезжает на место удаляемого: O(1), но порядок не сохраняется
+        last = self.items.pop()
+        if last is not obj:
+            self.items[obj.slot] = last
+            last.slot = obj.slot
+        obj.slot = -1
+
+    def clear(self):
+        for obj in self.items:
+            obj.slot = -1
+        self.items.clear()
+
+
+class EntityPool:
+    def __init__(self, cls: type):
+        self.cls = cls
+        self._free: List = []
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.active = 0
+        self.peak_active = 0
+
+    def acquire(self, *args):
+        if self._free:
+            obj = self._free.pop()
+            obj.reset(*args)
+            self.reused += 1
+        else:
+            obj = self.cls(*args)
+            self.created += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        return obj
+
+    def release(self, obj):
+        self._free.append(obj)
+        self.active -= 1
+        self.released += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "released": self.released,
+            "active": self.active,
+            "free": len(self._free),
+            "peak_active": self.peak_active,
+        }
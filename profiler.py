@@ -0,0 +1,87 @@
+import csv
+import json
+import time
+from array import array
+from typing import Dict, List, Tuple
+
+
+class FrameProfiler:
+    def __init__(self, capacity: int = 600):
+        self.capacity = capacity
+        self.enabled = False
+        self.frames = 0
+        self._buffers: Dict[str, array] = {}
+        self._current: Dict[str, float] = {}
+
+    def start(self) -> float:
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, name: str, start: float):
+        # start == 0: профилировщик включили посреди замера
+        if self.enabled and start:
+            self._current[name] = self._current.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        i = self.frames % self.capacity
+        current = self._current
+        for name, buf in self._buffers.items():
+            buf[i] = current.pop(name, 0.0)
+        # Новые области замеров получают свой кольцевой буфер при первом появлении
+        for name, value in current.items():
+            buf = array('f', bytes(4 * self.capacity))
+            buf[i] = value
+            self._buffers[name] = buf
+        current.clear()
+        self.frames += 1
+
+    def names(self) -> List[str]:
+        return list(self._buffers)
+
+    def samples(self, name: str, count: int = 0) -> List[float]:
+        buf = self._buffers.get(name)
+        if buf is None:
+            return []
+        available = min(self.frames, self.capacity)
+        count = min(count or available, available)
+        end = self.frames % self.capacity
+        return [buf[(end - count + k) % self.capacity] for k in range(count)]
+
+    def worst(self, count: int = 5, window: int = 120) -> List[Tuple[str, float, float]]:
+        rows = []
+        for name in self._buffers:
+            if name == "frame":
+                continue
+            values = self.samples(name, window)
+            if values:
+                rows.append((name, max(values), sum(values) / len(values)))
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:count]
+
+    def export_csv(self, path: str):
+        names = self.names()
+        columns = [self.samples(name) for name in names]
+        first_frame = self.frames - len(columns[0]) if columns else 0
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + [f"{name}_ms" for name in names])
+            for k, row in enumerate(zip(*columns)):
+                writer.writerow([first_frame + k] + [f"{value:.4f}" for value in row])
+
+    def export_json(self, path: str):
+        data = {
+            "capacity": self.capacity,
+            "frames": self.frames,
+            "scopes_ms": {name: [round(value, 4) for value in self.samples(name)] for name in self.names()},
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    def clear(self):
+        self._buffers.clear()
+        self._current.clear()
+        self.frames = 0
+
+
+profiler = FrameProfiler()
@@ -0,0 +1,42 @@
+from typing import List, Tuple
+import pygame
+
+# Слои в порядке отрисовки
+LAYER_PICKUPS = 0
+LAYER_ENEMIES = 1
+LAYER_CHARACTER = 2
+LAYER_WEAPON = 3
+LAYER_EFFECTS = 4
+LAYER_UI = 5
+LAYER_HUD = 6
+LAYER_COUNT = 7
+
+
+class RenderQueue:
+    def __init__(self, viewport: pygame.Rect):
+        self.viewport = viewport
+        self.layers: List[List[Tuple[pygame.Surface, pygame.Rect]]] = [[] for _ in range(LAYER_COUNT)]
+        self.submitted = 0
+        self.culled = 0
+
+    def submit(self, layer: int, surface: pygame.Surface, rect: pygame.Rect):
+        self.submitted += 1
+        if not self.viewport.colliderect(rect):
+            self.culled += 1
+            return
+        self.layers[layer].append((surface, rect))
+
+    def flush(self, target: pygame.Surface) -> List[pygame.Rect]:
+        # Один вызов blits на слой вместо blit на каждый объект
+        drawn = []
+        for items in self.layers:
+            if items:
+                drawn += target.blits(items)
+                items.clear()
+        return drawn
+
+    def reset_counts(self) -> Tuple[int, int]:
+        counts = (self.submitted, self.culled)
+        self.submitted = 0
+        self.culled = 0
+        return counts
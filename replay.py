@@ -0,0 +1,144 @@
+import argparse
+import os
+import struct
+import sys
+import time
+from typing import Iterator, List
+from simulation import Simulation, TickInput
+from leaderboard_store import LeaderboardStore
+
+REPLAYS_DIR = "replays"
+MAGIC = b"MRPL"
+# 2: картинки грибов больше не тратят игровой ГСЧ, записи версии 1 воспроизводятся иначе
+VERSION = 2
+# магия, версия, зерно, длина уровня, тактов, итоговый счет, число серий
+HEADER = struct.Struct("<4sBQiIiI")
+# Серия одинаковых тактов: код ввода и сколько тактов подряд он держится
+RUN = struct.Struct("<BH")
+MAX_RUN = 0xFFFF
+
+
+def pack_input(inp: TickInput) -> int:
+    # Биты 0-3: влево, вправо, атака, пауза; биты 4-6: оружие + 1 (0 - клавиша не нажата)
+    return inp.left | inp.right << 1 | inp.attack << 2 | inp.pause << 3 | (inp.weapon + 1) << 4
+
+
+def unpack_input(code: int) -> TickInput:
+    return TickInput(bool(code & 1), bool(code & 2), bool(code & 4), (code >> 4) - 1, bool(code & 8))
+
+
+class Replay:
+    def __init__(self, seed: int, char_type: str, player_name: str = "", level_length: int = 2400):
+        self.seed = seed
+        self.char_type = char_type
+        self.player_name = player_name
+        self.level_length = level_length
+        self.score = 0
+        self.ticks = 0
+        self.runs: List[List[int]] = []
+
+    def record(self, inp: TickInput):
+        code = pack_input(inp)
+        if self.runs and self.runs[-1][0] == code and self.runs[-1][1] < MAX_RUN:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([code, 1])
+        self.ticks += 1
+
+    def inputs(self) -> Iterator[TickInput]:
+        for code, count in self.runs:
+            inp = unpack_input(code)
+            for _ in range(count):
+                yield inp
+
+    def to_bytes(self) -> bytes:
+        parts = [HEADER.pack(MAGIC, VERSION, self.seed, self.level_length, self.ticks, self.score, len(self.runs))]
+        for text in (self.char_type, self.player_name):
+            data = text.encode("utf-8")[:255]
+            parts.append(bytes([len(data)]) + data)
+        parts.extend(RUN.pack(code, count) for code, count in self.runs)
+        return b"".join(parts)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "Replay":
+        magic, version, seed, level_length, ticks, score, run_count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Неизвестный формат записи")
+        pos = HEADER.size
+        texts = []
+        for _ in range(2):
+            size = data[pos]
+            texts.append(data[pos + 1:pos + 1 + size].decode("utf-8"))
+            pos += 1 + size
+        replay = Replay(seed, texts[0], texts[1], level_length)
+        replay.runs = [list(RUN.unpack_from(data, pos + i * RUN.size)) for i in range(run_count)]
+        replay.ticks = ticks
+        replay.score = score
+        return replay
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    def save_to_dir(self, directory: str = REPLAYS_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{self.char_type}_{self.score}.rpl"
+        path = os.path.join(directory, name)
+        self.save(path)
+        return path
+
+    @staticmethod
+    def load(path: str) -> "Replay":
+        with open(path, 'rb') as f:
+            return Replay.from_bytes(f.read())
+
+
+def run_headless(replay: Replay) -> Simulation:
+    sim = Simulation(replay.seed)
+    sim.max_background_offset = replay.level_length
+    sim.start(replay.char_type)
+    for inp in replay.inputs():
+        if sim.game_state not in ["playing", "moving_forward"]:
+            break
+        sim.step(inp)
+    return sim
+
+
+def check(replay: Replay, score: int, ticks: int) -> List[str]:
+    errors = []
+    if score != replay.score:
+        errors.append(f"счет {score}, в записи {replay.score}")
+    if ticks != replay.ticks:
+        errors.append(f"тактов {ticks}, в записи {replay.ticks}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка записанного забега без окна")
+    parser.add_argument("paths", nargs="+", help="файлы записей .rpl")
+    parser.add_argument("--leaderboard", action="store_true", help="проверить, что результат есть в таблице лидеров")
+    parser.add_argument("--db", default="leaderboard.db")
+    args = parser.parse_args()
+    store = None
+    if args.leaderboard:
+        store = LeaderboardStore(args.db)
+    failed = 0
+    for path in args.paths:
+        replay = Replay.load(path)
+        started = time.perf_counter()
+        sim = run_headless(replay)
+        elapsed = time.perf_counter() - started
+        errors = check(replay, sim.score, sim.ticks)
+        if store is not None and not errors and not store.has_entry(replay.player_name or "Unknown", sim.score, replay.char_type):
+            errors.append("нет такой записи в таблице лидеров")
+        status = "OK" if not errors else "ОШИБКА: " + "; ".join(errors)
+        print(f"{path}: {replay.char_type}, счет {sim.score}, тактов {sim.ticks}, "
+              f"{sim.ticks / elapsed if elapsed else 0:.0f} тактов/с - {status}")
+        failed += bool(errors)
+    if store is not None:
+        store.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import random
+from typing import Callable, Dict, List, NamedTuple, Optional
+from constants import *
+from game_objects import *
+from spatial import SortedIndex
+from pools import ActiveList, EntityPool
+from profiler import profiler
+
+CHAR_TYPES = ["elf", "witch", "warrior", "bard", "healer", "student"]
+
+
+class TickInput(NamedTuple):
+    left: bool = False
+    right: bool = False
+    attack: bool = False
+    weapon: int = -1
+    pause: bool = False
+
+
+IDLE_INPUT = TickInput()
+
+
+class Simulation:
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        # Только для выбора картинок; игровые случайности берутся из self.rng
+        self.skin_rng = random.Random(seed)
+        self.max_background_offset = 2400
+        self.min_group_size = 3
+        self.max_group_size = 6
+        self.mushrooms = ActiveList()
+        self.brains = ActiveList()
+        self.mushroom_pool = EntityPool(Mushroom)
+        self.brain_pool = EntityPool(Brain)
+        self.mushroom_index = SortedIndex()
+        self.brain_index = SortedIndex()
+        # Подклассы переопределяют reset() с учетом своих полей, которых еще нет
+        Simulation.reset(self, seed)
+
+    def reset(self, seed: Optional[int] = None):
+        self.reseed(seed)
+        self.clear_mushrooms()
+        self.clear_brains()
+        self.character = None
+        self.current_group = 0
+        self.group_defeated = True
+        self.background_offset = 0
+        self.score = 0
+        self.ticks = 0
+        self.game_state = "playing"
+
+    def reseed(self, seed: Optional[int]):
+        self.seed = seed
+        self.rng.seed(seed)
+        self.skin_rng.seed(seed)
+
+    def start(self, char_type: str):
+        self.character = Character(SCREEN_WIDTH//4, GROUND_HEIGHT, char_type)
+        self.game_state = "playing"
+        self.spawn_mushroom_group()
+
+    def on_game_over(self):
+        pass
+
+    def spawn_mushroom_group(self):
+        group_size = self.rng.randint(self.min_group_size, self.max_group_size)
+        start_x = self.background_offset + SCREEN_WIDTH + 100
+        has_big = self.rng.random() < 0.3
+        for i in range(group_size):
+            x = start_x + i * 100
+            is_big = has_big and (i == group_size - 1)
+            mushroom = self.mushroom_pool.acquire(x, GROUND_HEIGHT, is_big, self.rng, self.skin_rng)
+            mushroom.state_timer = self.rng.randint(30, 90)
+            self.mushrooms.add(mushroom)
+            self.mushroom_index.insert(mushroom, x)
+        self.group_defeated = False
+        self.current_group += 1
+
+    def resolve_attack(self):
+        attack_result = self.character.attack()
+        if attack_result:
+            attack_pos = self.character.x + self.character.direction * attack_result["range"]
+            for mushroom in self.mushroom_index.query(attack_pos - 30, attack_pos + 30):
+                destroyed, brain_drop = mushroom.take_damage(attack_result["damage"])
+                if destroyed:
+                    self.score += mushroom.points
+                    if brain_drop:
+                        self.add_brain(mushroom.x, mushroom.y)
+
+    def add_brain(self, x: int, y: int):
+        brain = self.brain_pool.acquire(x, y)
+        self.brains.add(brain)
+        self.brain_index.insert(brain, x)
+
+    def remove_brain(self, brain: Brain):
+        self.brains.remove(brain)
+        self.brain_index.remove(brain)
+        self.brain_pool.release(brain)
+
+    def remove_mushroom(self, mushroom: Mushroom):
+        self.mushrooms.remove(mushroom)
+        self.mushroom_index.remove(mushroom)
+        self.mushroom_pool.release(mushroom)
+
+    def clear_brains(self):
+        for brain in self.brains:
+            self.brain_pool.release(brain)
+        self.brains.clear()
+        self.brain_index.clear()
+
+    def clear_mushrooms(self):
+        for mushroom in self.mushrooms:
+            self.mushroom_pool.release(mushroom)
+        self.mushrooms.clear()
+        self.mushroom_index.clear()
+
+    def step(self, inp: TickInput):
+        if self.game_state not in ["playing", "moving_forward"]:
+            return
+        self.ticks += 1
+        if self.game_state == "playing":
+            if inp.attack and self.character:
+                self.resolve_attack()
+            if inp.pause:
+                self.game_state = "game_over"
+                return
+        if self.character:
+            t = profiler.start()
+            self.character.update(inp.left, inp.right)
+            profiler.stop("character.update", t)
+            if inp.weapon >= 0:
+                self.character.current_weapon = inp.weapon
+        if self.game_state == "playing":
+            self.update_mushrooms()
+        elif self.game_state == "moving_forward":
+            self.update_scroll()
+
+    def update_mushrooms(self):
+        active_mushrooms = 0
+        character = self.character
+        target_x = character.x if character else SCREEN_WIDTH//2
+        mushrooms = self.mushrooms
+        t = profiler.start()
+        i = 0
+        while i < len(mushrooms):
+            mushroom = mushrooms[i]
+            if mushroom.is_dead():
+                # На место удаленного встает последний, его обрабатываем на этой же позиции
+                self.remove_mushroom(mushroom)
+                continue
+            mushroom.update(target_x)
+            self.mushroom_index.move(mushroom, mushroom.x)
+            # Удар гриба проверяется сразу после его хода, в порядке списка; после попадания
+            # персонаж неуязвим, так что за такт проходит не больше одного удара
+            if character and mushroom.is_attacking() and abs(mushroom.x - character.x) < 50:
+                if character.take_damage() and character.health <= 0:
+                    self.game_state = "game_over"
+                    self.on_game_over()
+            if mushroom.health > 0 and mushroom.death_animation <= 0:
+                active_mushrooms += 1
+            i += 1
+        profiler.stop("mushrooms.update", t)
+        self.update_brains()
+        if active_mushrooms == 0 and len(self.mushrooms) > 0:
+            self.clear_mushrooms()
+            self.group_defeated = True
+            self.game_state = "moving_forward"
+        if self.group_defeated and len(self.mushrooms) == 0:
+            self.spawn_mushroom_group()
+
+    def update_brains(self):
+        t = profiler.start()
+        brains = self.brains
+        i = 0
+        while i < len(brains):
+            brain = brains[i]
+            if brain.update():
+                self.remove_brain(brain)
+            else:
+                i += 1
+        if self.character and self.brains:
+            reach = (self.character.width + BRAIN_WIDTH) // 2 + 1
+            x = self.character.x
+            for brain in self.brain_index.query(x - reach, x + reach):
+                if self.character.rect.colliderect(brain.rect):
+                    self.score += 100
+                    self.remove_brain(brain)
+        profiler.stop("brains.update", t)
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        return {"mushrooms": self.mushroom_pool.stats(), "brains": self.brain_pool.stats()}
+
+    def index_stats(self) -> Dict[str, Dict[str, int]]:
+        return {"mushrooms": self.mushroom_index.stats(), "brains": self.brain_index.stats()}
+
+    def update_scroll(self):
+        if self.character:
+            self.character.x += self.character.speed
+            self.background_offset += self.character.speed
+            if self.character.x >= SCREEN_WIDTH // 2:
+                self.character.x = SCREEN_WIDTH // 4
+                self.game_state = "playing"
+            # max_background_offset == 0 - бесконечный уровень, фон зацикливается
+            if self.max_background_offset and self.background_offset >= self.max_background_offset - SCREEN_WIDTH:
+                self.background_offset = self.max_background_offset - SCREEN_WIDTH
+                self.game_state = "game_over"
+                self.on_game_over()
+
+
+def simulate(char_type: str, seed: int, max_ticks: int,
+             policy: Optional[Callable[[Simulation], TickInput]] = None,
+             sim_class: type = Simulation) -> Simulation:
+    sim = sim_class(seed)
+    sim.start(char_type)
+    while sim.game_state in ["playing", "moving_forward"] and sim.ticks < max_ticks:
+        sim.step(policy(sim) if policy else IDLE_INPUT)
+    return sim
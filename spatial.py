@@ -0,0 +1,84 @@
+import bisect
+from typing import Dict, Iterator, List
+
+
+class SortedIndex:
+    def __init__(self):
+        self._xs: List[int] = []
+        self._items: List = []
+        self._where: Dict[int, int] = {}
+        self.queries = 0
+        self.candidates = 0
+        self.inserts = 0
+        self.removals = 0
+        self.moves = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._items)
+
+    def __contains__(self, item) -> bool:
+        return id(item) in self._where
+
+    def insert(self, item, x: int):
+        i = bisect.bisect_right(self._xs, x)
+        self._xs.insert(i, x)
+        self._items.insert(i, item)
+        self._where[id(item)] = x
+        self.inserts += 1
+
+    def _find(self, item) -> int:
+        i = bisect.bisect_left(self._xs, self._where[id(item)])
+        while self._items[i] is not item:
+            i += 1
+        return i
+
+    def remove(self, item):
+        i = self._find(item)
+        del self._xs[i]
+        del self._items[i]
+        del self._where[id(item)]
+        self.removals += 1
+
+    def move(self, item, x: int):
+        if self._where[id(item)] == x:
+            return
+        i = self._find(item)
+        xs, items = self._xs, self._items
+        xs[i] = x
+        # За такт объекты смещаются на пару пикселей, так что хватает пары перестановок
+        while i > 0 and xs[i - 1] > x:
+            xs[i - 1], xs[i] = xs[i], xs[i - 1]
+            items[i - 1], items[i] = items[i], items[i - 1]
+            i -= 1
+        while i + 1 < len(xs) and xs[i + 1] < x:
+            xs[i + 1], xs[i] = xs[i], xs[i + 1]
+            items[i + 1], items[i] = items[i], items[i + 1]
+            i += 1
+        self._where[id(item)] = x
+        self.moves += 1
+
+    def query(self, lo: int, hi: int) -> List:
+        # Объекты со строго lo < x < hi
+        i = bisect.bisect_right(self._xs, lo)
+        j = bisect.bisect_left(self._xs, hi)
+        self.queries += 1
+        self.candidates += j - i
+        return self._items[i:j]
+
+    def clear(self):
+        self._xs.clear()
+        self._items.clear()
+        self._where.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._items),
+            "queries": self.queries,
+            "candidates": self.candidates,
+            "inserts": self.inserts,
+            "removals": self.removals,
+            "moves": self.moves,
+        }
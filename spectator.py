@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import pygame
+from constants import *
+from assets import assets, texts, FADE_ALPHAS
+from backgrounds import load_background
+from game_objects import Character, Mushroom, Brain, WEAPONS
+from simulation import Simulation, CHAR_TYPES
+
+DEFAULT_PORT = 50007
+MSG_SNAPSHOT = 1
+MSG_ACK = 2
+STATES = ["loading", "character_select", "playing", "moving_forward", "game_over", "leaderboard"]
+MUSHROOM_STATES = ["idle", "moving", "attacking"]
+
+# тип, такт, такт базового снимка (0 - полный снимок)
+MESSAGE = struct.Struct("<BII")
+# счет, смещение фона, группа, x персонажа, здоровье, оружие, направление, прозрачность, персонаж, состояние игры
+STATE = struct.Struct("<iiHhbbbBBB")
+# id, x, состояние, прозрачность, большой, номер картинки
+MUSHROOM = struct.Struct("<HiBBBB")
+# id, x, y
+BRAIN = struct.Struct("<Hih")
+COUNTS = struct.Struct("<HH")
+ENTITY_ID = struct.Struct("<H")
+ACK = struct.Struct("<BI")
+HISTORY = 120
+CLIENT_TIMEOUT = 5.0
+
+
+class Snapshot(NamedTuple):
+    tick: int
+    state: bytes
+    mushrooms: Dict[int, bytes]
+    brains: Dict[int, bytes]
+
+
+def encode_entities(records: Dict[int, bytes], base: Dict[int, bytes]) -> List[bytes]:
+    # Отправляем только новые и изменившиеся записи плюс список исчезнувших id
+    changed = [record for entity_id, record in records.items() if base.get(entity_id) != record]
+    removed = [ENTITY_ID.pack(entity_id) for entity_id in base if entity_id not in records]
+    return [COUNTS.pack(len(changed), len(removed))] + changed + removed
+
+
+def encode_delta(snapshot: Snapshot, base: Optional[Snapshot]) -> bytes:
+    parts = [MESSAGE.pack(MSG_SNAPSHOT, snapshot.tick, base.tick if base else 0), snapshot.state]
+    parts += encode_entities(snapshot.mushrooms, base.mushrooms if base else {})
+    parts += encode_entities(snapshot.brains, base.brains if base else {})
+    return b"".join(parts)
+
+
+def decode_entities(data: bytes, pos: int, record: struct.Struct, base: Dict[int, bytes]) -> Tuple[Dict[int, bytes], int]:
+    changed, removed = COUNTS.unpack_from(data, pos)
+    pos += COUNTS.size
+    records = dict(base)
+    for _ in range(changed):
+        entry = data[pos:pos + record.size]
+        records[ENTITY_ID.unpack_from(entry)[0]] = entry
+        pos += record.size
+    for _ in range(removed):
+        records.pop(ENTITY_ID.unpack_from(data, pos)[0], None)
+        pos += ENTITY_ID.size
+    return records, pos
+
+
+def decode_delta(data: bytes, history: Dict[int, Snapshot]) -> Optional[Snapshot]:
+    kind, tick, base_tick = MESSAGE.unpack_from(data)
+    base = history.get(base_tick) if base_tick else None
+    if kind != MSG_SNAPSHOT or (base_tick and base is None):
+        return None
+    pos = MESSAGE.size
+    state = data[pos:pos + STATE.size]
+    pos += STATE.size
+    mushrooms, pos = decode_entities(data, pos, MUSHROOM, base.mushrooms if base else {})
+    brains, pos = decode_entities(data, pos, BRAIN, base.brains if base else {})
+    return Snapshot(tick, state, mushrooms, brains)
+
+
+class BroadcastProtocol(asyncio.DatagramProtocol):
+    def __init__(self, broadcaster: "StateBroadcaster"):
+        self.broadcaster = broadcaster
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) == ACK.size:
+            kind, tick = ACK.unpack(data)
+            if kind == MSG_ACK:
+                self.broadcaster.on_ack(addr, tick)
+
+
+class StateBroadcaster:
+    def __init__(self, port: int = DEFAULT_PORT, host: str = "127.0.0.1"):
+        self.address = (host, port)
+        self.clients: Dict[Tuple, List] = {}
+        self.history: Dict[int, Snapshot] = {}
+        self.ids: Dict[int, int] = {}
+        # Свой счетчик снимков: такты симуляции обнуляются при рестарте
+        self.sequence = 0
+        self.skins: Dict[str, int] = {}
+        self.ticks = 0
+        self.messages = 0
+        self.full_messages = 0
+        self.bytes_sent = 0
+        self.serialize_seconds = 0.0
+        self.transport = None
+        self.loop = asyncio.new_event_loop()
+        self._error: Optional[OSError] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="spectator-broadcast", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.transport, _ = self.loop.run_until_complete(
+                self.loop.create_datagram_endpoint(lambda: BroadcastProtocol(self), local_addr=self.address))
+        except OSError as e:
+            # Порт занят или адрес недоступен: ошибку поднимет конструктор, иначе он ждал бы вечно
+            self._error = e
+            self.loop.close()
+            return
+        finally:
+            self._ready.set()
+        self.loop.run_forever()
+        self.transport.close()
+        self.loop.close()
+
+    def entity_id(self, obj) -> int:
+        # Объекты живут в пулах, поэтому id(obj) ограничен размером пула; переводим в короткие номера
+        key = id(obj)
+        entity_id = self.ids.get(key)
+        if entity_id is None:
+            entity_id = self.ids[key] = len(self.ids) + 1
+        return entity_id
+
+    def skin(self, mushroom: Mushroom) -> int:
+        path = mushroom.image_key[0]
+        index = self.skins.get(path)
+        if index is None:
+            paths = Mushroom.image_paths(mushroom.is_big)
+            index = self.skins[path] = paths.index(path) if path in paths else 255
+        return index
+
+    def snapshot(self, sim: Simulation, game_state: str) -> Snapshot:
+        character = sim.character
+        if character:
+            state = STATE.pack(sim.score, sim.background_offset, sim.current_group, character.x, character.health,
+                               character.current_weapon, character.direction, character.alpha,
+                               CHAR_TYPES.index(character.char_type), STATES.index(game_state))
+        else:
+            state = STATE.pack(sim.score, sim.background_offset, sim.current_group, 0, 0, 0, 1, 255, 0, STATES.index(game_state))
+        mushrooms = {}
+        for mushroom in sim.mushrooms:
+            entity_id = self.entity_id(mushroom)
+            mushrooms[entity_id] = MUSHROOM.pack(entity_id, mushroom.x, MUSHROOM_STATES.index(mushroom.state),
+                                                 mushroom.alpha, mushroom.is_big, self.skin(mushroom))
+        brains = {}
+        for brain in sim.brains:
+            entity_id = self.entity_id(brain)
+            brains[entity_id] = BRAIN.pack(entity_id, brain.x, brain.y)
+        self.sequence += 1
+        return Snapshot(self.sequence, state, mushrooms, brains)
+
+    def publish(self, sim: Simulation, game_state: str):
+        if not self.clients:
+            return
+        started = time.perf_counter()
+        snapshot = self.snapshot(sim, game_state)
+        self.serialize_seconds += time.perf_counter() - started
+        self.loop.call_soon_threadsafe(self._broadcast, snapshot)
+
+    def _broadcast(self, snapshot: Snapshot):
+        self.ticks += 1
+        self.history[snapshot.tick] = snapshot
+        self.history.pop(snapshot.tick - HISTORY, None)
+        now = time.monotonic()
+        started = time.perf_counter()
+        for addr, client in list(self.clients.items()):
+            acked, last_seen = client
+            if now - last_seen > CLIENT_TIMEOUT:
+                del self.clients[addr]
+                continue
+            # Разница считается от последнего подтвержденного клиентом снимка
+            base = self.history.get(acked)
+            data = encode_delta(snapshot, base)
+            self.transport.sendto(data, addr)
+            self.messages += 1
+            self.full_messages += base is None
+            self.bytes_sent += len(data)
+        self.serialize_seconds += time.perf_counter() - started
+
+    def on_ack(self, addr, tick: int):
+        client = self.clients.get(addr)
+        if client is None:
+            self.clients[addr] = [tick, time.monotonic()]
+        else:
+            client[0] = max(client[0], tick)
+            client[1] = time.monotonic()
+
+    def stats(self) -> Dict[str, float]:
+        ticks = max(1, self.ticks)
+        return {
+            "ticks": self.ticks,
+            "clients": len(self.clients),
+            "messages": self.messages,
+            "full_messages": self.full_messages,
+            "bytes_per_tick": self.bytes_sent / ticks,
+            "bytes_per_message": self.bytes_sent / max(1, self.messages),
+            "serialize_us_per_tick": self.serialize_seconds / ticks * 1e6,
+        }
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+class SpectatorClient:
+    def __init__(self, port: int = DEFAULT_PORT, host: str = "127.0.0.1"):
+        self.server = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.setblocking(False)
+        self.history: Dict[int, Snapshot] = {}
+        self.current: Optional[Snapshot] = None
+        self.received = 0
+        self.bytes_received = 0
+        self.last_ack = 0.0
+
+    def poll(self):
+        while True:
+            try:
+                data = self.sock.recv(65535)
+            except BlockingIOError:
+                break
+            self.received += 1
+            self.bytes_received += len(data)
+            snapshot = decode_delta(data, self.history)
+            if snapshot is None:
+                continue
+            self.history[snapshot.tick] = snapshot
+            self.history.pop(snapshot.tick - HISTORY, None)
+            if self.current is None or snapshot.tick >= self.current.tick:
+                self.current = snapshot
+            self.ack(snapshot.tick)
+        # Пока игра стоит в меню, снимков нет: напоминаем о себе, чтобы сервер нас не забыл
+        if time.monotonic() - self.last_ack > 0.5:
+            self.ack(self.current.tick if self.current else 0)
+
+    def ack(self, tick: int):
+        self.sock.sendto(ACK.pack(MSG_ACK, tick), self.server)
+        self.last_ack = time.monotonic()
+
+    def draw(self, screen: pygame.Surface, background):
+        if self.current is None:
+            screen.fill(BLACK)
+            text = texts.render(fonts.medium, "Ожидание трансляции...")
+            screen.blit(text, (SCREEN_WIDTH//2 - text.get_width()//2, SCREEN_HEIGHT//2))
+            return
+        (score, offset, group, char_x, health, weapon, direction, alpha,
+         char_index, game_state) = STATE.unpack(self.current.state)
+        background.draw(screen, offset)
+        pygame.draw.rect(screen, BLACK, (0, GROUND_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT - GROUND_HEIGHT))
+        for record in self.current.brains.values():
+            _, x, y = BRAIN.unpack(record)
+            image = assets.atlas(*Brain.image_keys()[0]).base
+            screen.blit(image, image.get_rect(center=(x, y)))
+        for record in self.current.mushrooms.values():
+            _, x, _, mushroom_alpha, is_big, skin = MUSHROOM.unpack(record)
+            size = (BIG_MUSHROOM_WIDTH, BIG_MUSHROOM_HEIGHT) if is_big else (MUSHROOM_WIDTH, MUSHROOM_HEIGHT)
+            paths = Mushroom.image_paths(bool(is_big))
+            path = paths[skin] if skin < len(paths) else ""
+            image = assets.atlas(path, size, alphas=FADE_ALPHAS).get(alpha=mushroom_alpha)
+            screen.blit(image, image.get_rect(center=(x, GROUND_HEIGHT - size[1] // 2)))
+        char_keys = Character.image_keys(CHAR_TYPES[char_index])
+        image = assets.atlas(*char_keys[0]).get(alpha=alpha)
+        char_y = GROUND_HEIGHT - CHARACTER_HEIGHT // 2
+        screen.blit(image, image.get_rect(center=(char_x, char_y)))
+        weapon_image = assets.atlas(*char_keys[1 + weapon]).get(flipped=direction == -1)
+        screen.blit(weapon_image, weapon_image.get_rect(center=(char_x + direction * 40, char_y - 20)))
+        lines = [f"Очки: {score}", f"Здоровье: {health}", f"Группа: {group}", f"Оружие: {WEAPONS[weapon]['name']}"]
+        if STATES[game_state] == "game_over":
+            lines.append("Игра окончена")
+        for i, line in enumerate(lines):
+            screen.blit(texts.render(fonts.medium, line), (10, 10 + i * 30))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Зритель: показывает игру, транслируемую с main.py --spectate-port")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+    pygame.display.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Грибное приключение - зритель")
+    clock = pygame.time.Clock()
+    client = SpectatorClient(args.port, args.host)
+    background = load_background("forest")
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+        client.poll()
+        client.draw(screen, background)
+        pygame.display.flip()
+        clock.tick(FPS)
+    print(f"получено {client.received} снимков, {client.bytes_received} байт")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import csv
+import pytest
+from batch import ResultWriter
+
+ROWS = [{"speed": 2, "score_mean": 10.5, "outcome": "death"}, {"speed": 3, "score_mean": 7.25, "outcome": "timeout"}]
+
+
+def write(path: str):
+    writer = ResultWriter(path)
+    for row in ROWS:
+        writer.write(row)
+    writer.close()
+
+
+def test_npz_is_columnar(tmp_path):
+    np = pytest.importorskip("numpy")
+    path = str(tmp_path / "results.npz")
+    write(path)
+    with np.load(path) as data:
+        assert sorted(data.files) == sorted(ROWS[0])
+        assert data["speed"].tolist() == [2, 3]
+        assert data["score_mean"].tolist() == [10.5, 7.25]
+
+
+def test_csv_keeps_rows(tmp_path):
+    path = str(tmp_path / "results.csv")
+    write(path)
+    with open(path, newline='') as f:
+        assert [row["outcome"] for row in csv.DictReader(f)] == ["death", "timeout"]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(SystemExit):
+        ResultWriter(str(tmp_path / "results.json"))
@@ -0,0 +1,67 @@
+import pytest
+from constants import *
+from simulation import Simulation
+
+
+def make_sim() -> Simulation:
+    sim = Simulation(1)
+    sim.start("elf")
+    sim.clear_mushrooms()
+    return sim
+
+
+def add_mushroom(sim: Simulation, dx: int, state: str = "attacking", timer: int = 30):
+    mushroom = sim.mushroom_pool.acquire(sim.character.x + dx, GROUND_HEIGHT, False, sim.rng, sim.skin_rng)
+    mushroom.state = state
+    mushroom.state_timer = timer
+    sim.mushrooms.add(mushroom)
+    sim.mushroom_index.insert(mushroom, mushroom.x)
+    return mushroom
+
+
+@pytest.mark.parametrize("dx, hit", [(49, True), (-49, True), (50, False), (-50, False)])
+def test_contact_range(dx, hit):
+    sim = make_sim()
+    add_mushroom(sim, dx)
+    health = sim.character.health
+    sim.update_mushrooms()
+    assert sim.character.health == health - hit
+
+
+def test_one_hit_per_tick():
+    sim = make_sim()
+    for dx in [-30, 0, 30]:
+        add_mushroom(sim, dx)
+    health = sim.character.health
+    sim.update_mushrooms()
+    assert sim.character.health == health - 1
+
+
+def test_hit_uses_position_after_own_update():
+    # Гриб подходит на этом же такте и сразу переходит в атаку
+    sim = make_sim()
+    add_mushroom(sim, 21, "moving", 50)
+    health = sim.character.health
+    sim.update_mushrooms()
+    assert sim.character.health == health - 1
+
+
+def test_dying_mushroom_still_hits():
+    sim = make_sim()
+    add_mushroom(sim, 40).death_animation = 20
+    add_mushroom(sim, 400, "idle", 100)
+    health = sim.character.health
+    sim.update_mushrooms()
+    assert sim.character.health == health - 1
+
+
+def test_lethal_hit_ends_game_once():
+    sim = make_sim()
+    calls = []
+    sim.on_game_over = lambda: calls.append(sim.ticks)
+    sim.character.health = 1
+    add_mushroom(sim, -10)
+    add_mushroom(sim, 10)
+    sim.update_mushrooms()
+    assert sim.game_state == "game_over"
+    assert len(calls) == 1
@@ -0,0 +1,98 @@
+import math
+import statistics
+import pytest
+from constants import *
+from simulation import Simulation
+from batch import DEFAULT_PARAMS, play
+
+np = pytest.importorskip("numpy")
+from mushroom_engine import VectorSimulation
+
+ENGINES = [Simulation, VectorSimulation]
+FIELDS = ["x", "state", "state_timer", "health", "alpha", "death_animation", "points"]
+
+
+def make_sim(sim_class: type) -> Simulation:
+    sim = sim_class(1)
+    sim.start("elf")
+    sim.clear_mushrooms()
+    return sim
+
+
+def add_mushroom(sim: Simulation, dx: int, state: str, timer: int, is_big: bool = False, dying: int = 0):
+    x = sim.character.x + dx
+    if isinstance(sim, VectorSimulation):
+        herd = sim.herd
+        herd.spawn([x], [is_big])
+        herd.state[-1] = ["idle", "moving", "attacking"].index(state)
+        herd.timer[-1] = timer
+        herd.death[-1] = dying
+        return
+    mushroom = sim.mushroom_pool.acquire(x, GROUND_HEIGHT, is_big, sim.rng, sim.skin_rng)
+    mushroom.state = state
+    mushroom.state_timer = timer
+    mushroom.death_animation = dying
+    sim.mushrooms.add(mushroom)
+    sim.mushroom_index.insert(mushroom, x)
+
+
+def observe(sim: Simulation) -> list:
+    mushrooms = [tuple(getattr(mushroom, field) for field in FIELDS) + (mushroom.is_attacking(),)
+                 for mushroom in sim.mushrooms]
+    return [sim.character.health, sim.score, sim.game_state] + mushrooms
+
+
+def test_views_follow_scalar_rules():
+    # Без переходов, которые тянут случайные числа, оба движка обязаны совпадать такт в такт
+    sims = [make_sim(sim_class) for sim_class in ENGINES]
+    for sim in sims:
+        add_mushroom(sim, 100, "moving", 90)
+        add_mushroom(sim, -150, "moving", 90, True)
+        add_mushroom(sim, 600, "idle", 1000)
+    for _ in range(60):
+        for sim in sims:
+            sim.update_mushrooms()
+        assert observe(sims[0]) == observe(sims[1])
+    assert sims[0].character.health < sims[0].character.max_health
+
+
+def test_dying_mushroom_still_hits():
+    sims = [make_sim(sim_class) for sim_class in ENGINES]
+    for sim in sims:
+        add_mushroom(sim, 40, "attacking", 30, dying=20)
+        add_mushroom(sim, 600, "idle", 1000)
+        sim.update_mushrooms()
+    assert observe(sims[0]) == observe(sims[1])
+    assert sims[0].mushrooms[0].death_animation > 0
+    assert sims[0].character.health == sims[0].character.max_health - 1
+
+
+def test_attack_scores_the_same():
+    sims = [make_sim(sim_class) for sim_class in ENGINES]
+    for sim in sims:
+        reach = sim.character.weapons[1]["range"]
+        add_mushroom(sim, reach - 10, "idle", 1000)
+        add_mushroom(sim, reach + 10, "idle", 1000)
+        add_mushroom(sim, reach + 40, "idle", 1000)
+        sim.character.current_weapon = 1
+        sim.character.direction = 1
+        sim.resolve_attack()
+    assert observe(sims[0]) == observe(sims[1])
+    assert sims[0].score == 10
+
+
+def test_reset_reseeds_herd():
+    sim = VectorSimulation(3)
+    sim.start("elf")
+    first = sim.herd.timer.copy()
+    sim.reset(3)
+    sim.start("elf")
+    assert np.array_equal(sim.herd.timer, first)
+
+
+def test_batch_averages_match():
+    # Случайности у движков разные, поэтому сравниваем средний счет бота: разница в пределах трех стандартных ошибок
+    scores = [[play(DEFAULT_PARAMS, seed, 3000, engine)[0] for seed in range(30)] for engine in ["scalar", "vector"]]
+    error = math.sqrt(sum(statistics.variance(values) / len(values) for values in scores))
+    assert all(statistics.mean(values) > 0 for values in scores)
+    assert abs(statistics.mean(scores[0]) - statistics.mean(scores[1])) < 3 * error
@@ -0,0 +1,62 @@
+import os
+import pytest
+from assets import assets
+from batch import Bot
+from replay import Replay, run_headless, check
+from simulation import Simulation
+import checkpoint
+
+
+def use_assets(path, monkeypatch, with_skins: bool):
+    # Файлы картинок не декодируются без окна: для выбора скина достаточно имен
+    path.mkdir()
+    monkeypatch.chdir(path)
+    if with_skins:
+        skins = path / "assets" / "mushrooms"
+        skins.mkdir(parents=True, exist_ok=True)
+        for name in ["small_1", "small_2", "small_3", "small_4", "small_5", "big_1", "big_2"]:
+            (skins / f"{name}.png").write_bytes(b"")
+    assets.invalidate_listings()
+
+
+def record(seed: int, ticks: int) -> Replay:
+    sim = Simulation(seed)
+    sim.start("elf")
+    bot = Bot(seed % 4)
+    replay = Replay(seed, "elf", "test", sim.max_background_offset)
+    while sim.game_state in ["playing", "moving_forward"] and sim.ticks < ticks:
+        inp = bot(sim)
+        replay.record(inp)
+        sim.step(inp)
+    replay.score = sim.score
+    return replay
+
+
+@pytest.mark.parametrize("recorded_with, played_with", [(True, False), (False, True)])
+def test_replay_does_not_depend_on_skin_files(tmp_path, monkeypatch, recorded_with, played_with):
+    use_assets(tmp_path / "record", monkeypatch, recorded_with)
+    replays = [Replay.from_bytes(record(seed, 3000).to_bytes()) for seed in range(8)]
+    use_assets(tmp_path / "play", monkeypatch, played_with)
+    for replay in replays:
+        sim = run_headless(replay)
+        assert check(replay, sim.score, sim.ticks) == []
+    assert any(replay.score for replay in replays)
+
+
+def test_checkpoint_resumes_without_skin_files(tmp_path, monkeypatch):
+    use_assets(tmp_path / "record", monkeypatch, True)
+    sim = Simulation(5)
+    sim.start("elf")
+    bot = Bot(1)
+    for _ in range(1500):
+        sim.step(bot(sim))
+    data = checkpoint.dump(sim)
+    use_assets(tmp_path / "play", monkeypatch, False)
+    other = Simulation()
+    checkpoint.restore(other, data)
+    for _ in range(1500):
+        if sim.game_state not in ["playing", "moving_forward"]:
+            break
+        sim.step(bot(sim))
+        other.step(bot(other))
+    assert (other.score, other.ticks, other.character.health) == (sim.score, sim.ticks, sim.character.health)